@@ -1,28 +1,40 @@
 ﻿"""
 Admin API endpoints for billing and inventory management
 """
+import uuid
 from typing import List, Optional
 from datetime import date, datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import BaseModel, Field, model_validator
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import String, cast, func, insert, literal, text, update
+from sqlalchemy.orm import noload, selectinload
 from sqlalchemy.exc import IntegrityError
 
-from db import get_session
+from db import get_session, values_subquery
 from models import (
     User, Contact, ContactType, Product, ProductType,
     SaleOrder, SaleOrderLine, OrderStatus,
     Invoice, InvoiceLine, InvoiceStatus,
-    PurchaseOrder, PurchaseOrderLine,
+    PurchaseOrder, PurchaseOrderLine, PurchaseReceipt, PurchaseReceiptLine,
     VendorBill, VendorBillLine,
     Payment, PaymentStatus, PaymentTerm
 )
 from auth import get_current_user
+from pagination import PageParams, paginate
+from rollups import record_order, retract_order
+from aging import aging_cache
+from search import product_index
+from websocket_manager import manager
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+PRODUCT_BULK_MAX_ITEMS = 10000
+PRODUCT_BULK_CHUNK_ROWS = 1000  # 5 bind parameters per row
+PAYMENT_BULK_MAX_ITEMS = 5000
+PURCHASE_RECEIPT_MAX_LINES = 5000
+
 # ============= SCHEMAS =============
 
 # Product Schemas
@@ -44,6 +56,24 @@ class ProductUpdate(BaseModel):
     product_type: Optional[ProductType] = None
     image_url: Optional[str] = None
 
+class ProductBulkUpdateItem(BaseModel):
+    product_id: int
+    version_id: Optional[int] = None  # Only apply if the product is still at this version
+    price: Optional[float] = Field(default=None, ge=0)
+    stock_delta: Optional[int] = None
+    stock_set: Optional[int] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def check_changes(self):
+        if self.stock_delta is not None and self.stock_set is not None:
+            raise ValueError("Use either stock_delta or stock_set, not both")
+        if self.price is None and self.stock_delta is None and self.stock_set is None:
+            raise ValueError("Nothing to update: give price, stock_delta or stock_set")
+        return self
+
+class ProductBulkUpdate(BaseModel):
+    items: List[ProductBulkUpdateItem] = Field(min_length=1, max_length=PRODUCT_BULK_MAX_ITEMS)
+
 # Contact Schemas
 class ContactCreate(BaseModel):
     name: str
@@ -123,6 +153,17 @@ class PurchaseOrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
     notes: Optional[str] = None
 
+class PurchaseReceiptLineCreate(BaseModel):
+    line_id: int  # PurchaseOrderLine id
+    quantity: int = Field(gt=0)
+    version_id: Optional[int] = None  # Only receive if the product is still at this version
+
+class PurchaseReceiptCreate(BaseModel):
+    received_date: Optional[date] = None
+    # Omit to receive everything still outstanding on the order
+    lines: Optional[List[PurchaseReceiptLineCreate]] = Field(default=None, min_length=1, max_length=PURCHASE_RECEIPT_MAX_LINES)
+    notes: Optional[str] = None
+
 # Vendor Bill Schemas
 class VendorBillLineCreate(BaseModel):
     product_id: int
@@ -154,6 +195,9 @@ class PaymentCreate(BaseModel):
     vendor_bill_id: Optional[int] = None
     notes: Optional[str] = None
 
+class PaymentBulkCreate(BaseModel):
+    payments: List[PaymentCreate] = Field(min_length=1, max_length=PAYMENT_BULK_MAX_ITEMS)
+
 class PaymentUpdate(BaseModel):
     status: Optional[PaymentStatus] = None
     notes: Optional[str] = None
@@ -312,6 +356,41 @@ def require_admin(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
+def lines_option(relationship, include_lines: bool):
+    """Lines are batch-loaded for the page only, or skipped (empty list) for summary views."""
+    return selectinload(relationship) if include_lines else noload(relationship)
+
+def date_range(query, column, date_from: Optional[date], date_to: Optional[date]):
+    if date_from:
+        query = query.where(column >= date_from)
+    if date_to:
+        query = query.where(column <= date_to)
+    return query
+
+class DocumentList:
+    """Filters and sort keys of a document list, shared by the list endpoints here and summaries.py."""
+
+    def __init__(self, model, contact_column, date_column):
+        self.model = model
+        self.contact_column = contact_column
+        self.date_column = date_column
+        self.sort_fields = {
+            "id": model.id, date_column.key: date_column,
+            "total_amount": model.total_amount, "created_at": model.created_at,
+        }
+
+    def filter(self, query, status, contact_id: Optional[int], date_from: Optional[date], date_to: Optional[date]):
+        if status:
+            query = query.where(self.model.status == status)
+        if contact_id:
+            query = query.where(self.contact_column == contact_id)
+        return date_range(query, self.date_column, date_from, date_to)
+
+SALE_ORDER_LIST = DocumentList(SaleOrder, SaleOrder.customer_id, SaleOrder.order_date)
+INVOICE_LIST = DocumentList(Invoice, Invoice.customer_id, Invoice.invoice_date)
+PURCHASE_ORDER_LIST = DocumentList(PurchaseOrder, PurchaseOrder.vendor_id, PurchaseOrder.order_date)
+VENDOR_BILL_LIST = DocumentList(VendorBill, VendorBill.vendor_id, VendorBill.bill_date)
+
 def calculate_order_totals(lines: List[SaleOrderLineCreate]) -> tuple:
     """Calculate total amount and tax for order lines"""
     subtotal = sum(line.unit_price * line.quantity - line.discount for line in lines)
@@ -330,12 +409,22 @@ def calculate_invoice_totals(lines: List[InvoiceLineCreate]) -> tuple:
 
 @router.get("/products")
 async def get_products(
+    response: Response,
+    category: Optional[str] = None,
+    product_type: Optional[ProductType] = None,
+    page: PageParams = Depends(),
     session: AsyncSession = Depends(get_session)
 ):
-    """Get all products"""
-    result = await session.execute(select(Product).order_by(Product.id))
-    products = result.scalars().all()
-    return products
+    """List products, one keyset page at a time"""
+    query = select(Product)
+    if category:
+        query = query.where(Product.category == category)
+    if product_type:
+        query = query.where(Product.product_type == product_type)
+    return await paginate(session, query, response, page, {
+        "id": Product.id, "name": Product.name, "price": Product.price,
+        "current_stock": Product.current_stock, "created_at": Product.created_at,
+    }, default_sort="id")
 
 @router.get("/products/{product_id}")
 async def get_product(
@@ -379,6 +468,88 @@ async def update_product(
     await session.refresh(product)
     return product
 
+# New stock for a bulk row; used in both SET and the non-negative guard
+BULK_NEW_STOCK = "COALESCE(v.stock_set, product.current_stock + COALESCE(v.stock_delta, 0))"
+
+def bulk_update_statement(items: List[ProductBulkUpdateItem]):
+    source, params = values_subquery("v", [
+        ("product_id", "INTEGER"), ("expected_version", "INTEGER"), ("new_price", "DOUBLE PRECISION"),
+        ("stock_delta", "INTEGER"), ("stock_set", "INTEGER"),
+    ], [(item.product_id, item.version_id, item.price, item.stock_delta, item.stock_set) for item in items])
+    # RETURNING columns stay unqualified (SQLite rejects table prefixes there); the
+    # VALUES columns are named so nothing is ambiguous on Postgres either
+    statement = text(f"""
+        UPDATE product SET
+            price = COALESCE(v.new_price, product.price),
+            current_stock = {BULK_NEW_STOCK},
+            version_id = product.version_id + 1
+        FROM {source}
+        WHERE product.id = v.product_id
+          AND (v.expected_version IS NULL OR product.version_id = v.expected_version)
+          AND {BULK_NEW_STOCK} >= 0
+        RETURNING id, price, current_stock, category, version_id
+    """)
+    return statement, params
+
+@router.post("/products/bulk-update")
+async def bulk_update_products(
+    data: ProductBulkUpdate,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Reprice and/or adjust stock for many products in one transaction.
+    Items whose version_id no longer matches, that do not exist or that would take
+    stock below zero are skipped and returned under `conflicts`; the rest are applied.
+    """
+    items = {item.product_id: item for item in data.items}
+    if len(items) != len(data.items):
+        raise HTTPException(status_code=400, detail="Each product_id may appear only once")
+
+    # Lock the rows first: gives previous stock for the broadcast and the reason for any conflict
+    result = await session.execute(
+        select(Product.id, Product.current_stock, Product.version_id)
+        .where(Product.id.in_(items))
+        .with_for_update()
+    )
+    before = {row.id: row for row in result}
+
+    updated = {}
+    item_list = list(items.values())
+    for start in range(0, len(item_list), PRODUCT_BULK_CHUNK_ROWS):
+        statement, params = bulk_update_statement(item_list[start:start + PRODUCT_BULK_CHUNK_ROWS])
+        result = await session.execute(statement, params)
+        updated.update({row.id: dict(row._mapping) for row in result})
+    await session.commit()
+
+    conflicts = []
+    for product_id, item in items.items():
+        if product_id in updated:
+            continue
+        current = before.get(product_id)
+        if current is None:
+            conflicts.append({"product_id": product_id, "reason": "not_found"})
+            continue
+        reason = "version_conflict" if item.version_id is not None and current.version_id != item.version_id else "negative_stock"
+        conflicts.append({
+            "product_id": product_id, "reason": reason,
+            "version_id": current.version_id, "current_stock": current.current_stock,
+        })
+
+    if updated:
+        # Raw UPDATE bypasses the ORM flush hook
+        product_index.dirty = True
+        stock_changes = [
+            {"product_id": product_id, "new_stock": row["current_stock"],
+             "category": row["category"], "previous_stock": before[product_id].current_stock}
+            for product_id, row in updated.items()
+            if row["current_stock"] != before[product_id].current_stock
+        ]
+        if stock_changes:
+            await manager.broadcast_stock_updates(stock_changes)
+
+    print(f"✅ Bulk product update: {len(updated)} updated, {len(conflicts)} conflicts")
+    return {"updated": list(updated.values()), "conflicts": conflicts}
+
 @router.delete("/products/{product_id}")
 async def delete_product(
     product_id: int,
@@ -421,16 +592,18 @@ async def delete_product(
 
 @router.get("/contacts")
 async def get_contacts(
+    response: Response,
     contact_type: Optional[ContactType] = None,
+    page: PageParams = Depends(),
     session: AsyncSession = Depends(get_session),
 ):
-    """Get all contacts, optionally filtered by type"""
+    """List contacts, optionally filtered by type"""
     query = select(Contact)
     if contact_type:
         query = query.where(or_(Contact.contact_type == contact_type, Contact.contact_type == ContactType.BOTH))
-    query = query.order_by(Contact.id)
-    result = await session.execute(query)
-    return result.scalars().all()
+    return await paginate(session, query, response, page, {
+        "id": Contact.id, "name": Contact.name, "created_at": Contact.created_at,
+    }, default_sort="id")
 
 @router.get("/contacts/{contact_id}")
 async def get_contact(
@@ -497,15 +670,21 @@ async def delete_contact(
 
 @router.get("/sales-orders", response_model=List[SaleOrderResponse])
 async def get_sales_orders(
+    response: Response,
+    status: Optional[OrderStatus] = None,
+    customer_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    include_lines: bool = True,
+    page: PageParams = Depends(),
     session: AsyncSession = Depends(get_session),
 ):
-    """Get all sales orders with customer and lines"""
-    result = await session.execute(
-        select(SaleOrder)
-        .options(selectinload(SaleOrder.customer), selectinload(SaleOrder.lines))
-        .order_by(SaleOrder.id.desc())
+    """List sales orders with customer and (optionally) lines"""
+    query = select(SaleOrder).options(
+        selectinload(SaleOrder.customer), lines_option(SaleOrder.lines, include_lines)
     )
-    return result.scalars().all()
+    query = SALE_ORDER_LIST.filter(query, status, customer_id, date_from, date_to)
+    return await paginate(session, query, response, page, SALE_ORDER_LIST.sort_fields)
 
 @router.get("/sales-orders/{order_id}", response_model=SaleOrderResponse)
 async def get_sales_order(
@@ -558,6 +737,7 @@ async def create_sales_order(
             **line_data.model_dump()
         )
         session.add(line)
+    await record_order(session, order.id)
     
     await session.commit()
     await session.refresh(order)
@@ -574,10 +754,13 @@ async def update_sales_order(
     if not order:
         raise HTTPException(status_code=404, detail="Sales order not found")
     
+    # Date, customer or status (cancellation) may move the order in the rollups
+    await retract_order(session, order.id)
     for key, value in order_data.model_dump(exclude_unset=True).items():
         setattr(order, key, value)
     
     session.add(order)
+    await record_order(session, order.id)
     await session.commit()
     await session.refresh(order)
     return order
@@ -592,6 +775,7 @@ async def delete_sales_order(
     if not order:
         raise HTTPException(status_code=404, detail="Sales order not found")
     
+    await retract_order(session, order.id)
     await session.delete(order)
     await session.commit()
     return {"message": "Sales order deleted successfully"}
@@ -600,15 +784,21 @@ async def delete_sales_order(
 
 @router.get("/invoices", response_model=List[InvoiceResponse])
 async def get_invoices(
+    response: Response,
+    status: Optional[InvoiceStatus] = None,
+    customer_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    include_lines: bool = True,
+    page: PageParams = Depends(),
     session: AsyncSession = Depends(get_session),
 ):
-    """Get all invoices with customer and lines"""
-    result = await session.execute(
-        select(Invoice)
-        .options(selectinload(Invoice.customer), selectinload(Invoice.lines))
-        .order_by(Invoice.id.desc())
+    """List invoices with customer and (optionally) lines"""
+    query = select(Invoice).options(
+        selectinload(Invoice.customer), lines_option(Invoice.lines, include_lines)
     )
-    return result.scalars().all()
+    query = INVOICE_LIST.filter(query, status, customer_id, date_from, date_to)
+    return await paginate(session, query, response, page, INVOICE_LIST.sort_fields)
 
 @router.get("/invoices/{invoice_id}", response_model=InvoiceResponse)
 async def get_invoice(
@@ -682,6 +872,7 @@ async def update_invoice(
     session.add(invoice)
     await session.commit()
     await session.refresh(invoice)
+    await aging_cache.invalidate("receivables")
     return invoice
 
 @router.delete("/invoices/{invoice_id}")
@@ -696,21 +887,28 @@ async def delete_invoice(
     
     await session.delete(invoice)
     await session.commit()
+    await aging_cache.invalidate("receivables")
     return {"message": "Invoice deleted successfully"}
 
 # ============= PURCHASE ORDER ENDPOINTS =============
 
 @router.get("/purchase-orders", response_model=List[PurchaseOrderResponse])
 async def get_purchase_orders(
+    response: Response,
+    status: Optional[OrderStatus] = None,
+    vendor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    include_lines: bool = True,
+    page: PageParams = Depends(),
     session: AsyncSession = Depends(get_session),
 ):
-    """Get all purchase orders"""
-    result = await session.execute(
-        select(PurchaseOrder)
-        .options(selectinload(PurchaseOrder.vendor), selectinload(PurchaseOrder.lines))
-        .order_by(PurchaseOrder.id.desc())
+    """List purchase orders with vendor and (optionally) lines"""
+    query = select(PurchaseOrder).options(
+        selectinload(PurchaseOrder.vendor), lines_option(PurchaseOrder.lines, include_lines)
     )
-    return result.scalars().all()
+    query = PURCHASE_ORDER_LIST.filter(query, status, vendor_id, date_from, date_to)
+    return await paginate(session, query, response, page, PURCHASE_ORDER_LIST.sort_fields)
 
 @router.get("/purchase-orders/{order_id}", response_model=PurchaseOrderResponse)
 async def get_purchase_order(
@@ -797,23 +995,219 @@ async def delete_purchase_order(
     if not order:
         raise HTTPException(status_code=404, detail="Purchase order not found")
     
+    result = await session.execute(
+        select(PurchaseReceipt.id).where(PurchaseReceipt.purchase_order_id == order_id).limit(1)
+    )
+    if result.scalar_one_or_none():
+        raise HTTPException(
+            status_code=409,
+            detail="Purchase order cannot be deleted because goods have been received against it. Cancel it instead.",
+        )
+
     await session.delete(order)
     await session.commit()
     return {"message": "Purchase order deleted successfully"}
 
+# ============= GOODS RECEIPT ENDPOINTS =============
+
+# Adds the received quantity per product in one statement; the version guard skips
+# rows changed since they were read, and the bump makes in-flight ORM edits fail
+RECEIVE_STOCK_SQL = """
+    UPDATE product SET
+        current_stock = product.current_stock + v.quantity,
+        version_id = product.version_id + 1
+    FROM {source}
+    WHERE product.id = v.product_id
+      AND (v.expected_version IS NULL OR product.version_id = v.expected_version)
+    RETURNING id, current_stock, category, version_id
+"""
+
+async def purchase_order_line_balances(session: AsyncSession, order_id: int) -> dict:
+    """{line_id: ordered / received / outstanding quantities} for one purchase order"""
+    received = func.coalesce(func.sum(PurchaseReceiptLine.quantity), 0)
+    result = await session.execute(
+        select(PurchaseOrderLine.id, PurchaseOrderLine.product_id, PurchaseOrderLine.quantity, received.label("received"))
+        .outerjoin(PurchaseReceiptLine, PurchaseReceiptLine.purchase_order_line_id == PurchaseOrderLine.id)
+        .where(PurchaseOrderLine.purchase_order_id == order_id)
+        .group_by(PurchaseOrderLine.id, PurchaseOrderLine.product_id, PurchaseOrderLine.quantity)
+        .order_by(PurchaseOrderLine.id)
+    )
+    return {
+        row.id: {
+            "line_id": row.id, "product_id": row.product_id, "ordered": row.quantity,
+            "received": row.received, "outstanding": max(row.quantity - row.received, 0),
+        }
+        for row in result
+    }
+
+async def receive_goods(session: AsyncSession, order_id: int, data: PurchaseReceiptCreate) -> dict:
+    """Record a receipt and raise stock in the caller's transaction. Raises HTTPException (caller rolls back)."""
+    # Locking the order serializes concurrent receipts against it
+    result = await session.execute(select(PurchaseOrder).where(PurchaseOrder.id == order_id).with_for_update())
+    order = result.scalars().first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Purchase order not found")
+    if order.status != OrderStatus.CONFIRMED:
+        raise HTTPException(status_code=400, detail=f"Only confirmed purchase orders can be received (status: {order.status.value})")
+
+    balances = await purchase_order_line_balances(session, order_id)
+    if data.lines is None:
+        receiving = [(line_id, line["outstanding"], None) for line_id, line in balances.items() if line["outstanding"] > 0]
+    else:
+        line_ids = [line.line_id for line in data.lines]
+        if len(set(line_ids)) != len(line_ids):
+            raise HTTPException(status_code=400, detail="Each line_id may appear only once")
+        unknown = [line_id for line_id in line_ids if line_id not in balances]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Lines not on this purchase order: {', '.join(map(str, unknown))}")
+        over = [line for line in data.lines if line.quantity > balances[line.line_id]["outstanding"]]
+        if over:
+            raise HTTPException(status_code=400, detail="Quantity exceeds what is outstanding: " + ", ".join(
+                f"line {line.line_id} ({line.quantity} > {balances[line.line_id]['outstanding']})" for line in over
+            ))
+        receiving = [(line.line_id, line.quantity, line.version_id) for line in data.lines]
+    if not receiving:
+        raise HTTPException(status_code=400, detail="Nothing left to receive on this purchase order")
+
+    # One row per product, however many lines it appears on
+    quantities, expected_versions = {}, {}
+    for line_id, quantity, version_id in receiving:
+        product_id = balances[line_id]["product_id"]
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if version_id is not None:
+            expected_versions[product_id] = version_id
+
+    # Lock the rows first: gives previous stock for the broadcast and the reason for any conflict
+    result = await session.execute(
+        select(Product.id, Product.current_stock, Product.version_id)
+        .where(Product.id.in_(quantities))
+        .with_for_update()
+    )
+    before = {row.id: row for row in result}
+    stale = sorted(
+        product_id for product_id, version_id in expected_versions.items()
+        if product_id in before and before[product_id].version_id != version_id
+    )
+    if stale:
+        raise HTTPException(status_code=409, detail=f"Products changed since they were read: {', '.join(map(str, stale))}. Reload and retry.")
+
+    updated = {}
+    items = list(quantities.items())
+    for start in range(0, len(items), PRODUCT_BULK_CHUNK_ROWS):
+        source, params = values_subquery("v", [
+            ("product_id", "INTEGER"), ("quantity", "INTEGER"), ("expected_version", "INTEGER"),
+        ], [(product_id, quantity, expected_versions.get(product_id)) for product_id, quantity in items[start:start + PRODUCT_BULK_CHUNK_ROWS]])
+        result = await session.execute(text(RECEIVE_STOCK_SQL.format(source=source)), params)
+        updated.update({row.id: dict(row._mapping) for row in result})
+    if len(updated) != len(quantities):
+        missing = sorted(set(quantities) - set(updated))
+        raise HTTPException(status_code=409, detail=f"Stock could not be updated for products: {', '.join(map(str, missing))}. Reload and retry.")
+
+    result = await session.execute(
+        select(func.count(PurchaseReceipt.id)).where(PurchaseReceipt.purchase_order_id == order_id)
+    )
+    receipt = PurchaseReceipt(
+        receipt_number=f"{order.order_number}-R{result.scalar_one() + 1}",
+        purchase_order_id=order_id,
+        received_date=data.received_date or datetime.utcnow().date(),
+        notes=data.notes,
+    )
+    session.add(receipt)
+    await session.flush()
+    lines = [
+        {"receipt_id": receipt.id, "purchase_order_line_id": line_id,
+         "product_id": balances[line_id]["product_id"], "quantity": quantity}
+        for line_id, quantity, _ in receiving
+    ]
+    await session.execute(insert(PurchaseReceiptLine.__table__), lines)
+
+    for line_id, quantity, _ in receiving:
+        balances[line_id]["received"] += quantity
+        balances[line_id]["outstanding"] -= quantity
+    return {
+        **receipt.model_dump(),
+        "lines": lines,
+        "fully_received": all(line["outstanding"] == 0 for line in balances.values()),
+        "stock": [
+            {"product_id": product_id, "previous_stock": before[product_id].current_stock,
+             "new_stock": row["current_stock"], "category": row["category"], "version_id": row["version_id"]}
+            for product_id, row in updated.items()
+        ],
+    }
+
+@router.post("/purchase-orders/{order_id}/receive", status_code=201)
+async def receive_purchase_order(
+    order_id: int,
+    data: Optional[PurchaseReceiptCreate] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Receive goods against a confirmed purchase order, in full (no body / no lines) or in part.
+    Stock for every product on the receipt is raised by one set-based UPDATE in the same
+    transaction as the receipt, and one coalesced stock event goes out after commit.
+    """
+    try:
+        receipt = await receive_goods(session, order_id, data or PurchaseReceiptCreate())
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    # Raw UPDATE bypasses the ORM flush hook
+    product_index.dirty = True
+    await manager.broadcast_stock_updates(
+        {"product_id": item["product_id"], "new_stock": item["new_stock"],
+         "category": item["category"], "previous_stock": item["previous_stock"]}
+        for item in receipt["stock"]
+    )
+    print(f"✅ Received {len(receipt['lines'])} lines on purchase order {order_id} ({receipt['receipt_number']})")
+    return receipt
+
+@router.get("/purchase-orders/{order_id}/receipts")
+async def get_purchase_order_receipts(
+    order_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Receipts recorded against a purchase order, with ordered / received / outstanding quantities per line"""
+    order = await session.get(PurchaseOrder, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Purchase order not found")
+    balances = await purchase_order_line_balances(session, order_id)
+    result = await session.execute(
+        select(PurchaseReceipt)
+        .options(selectinload(PurchaseReceipt.lines))
+        .where(PurchaseReceipt.purchase_order_id == order_id)
+        .order_by(PurchaseReceipt.id)
+    )
+    return {
+        "purchase_order_id": order_id,
+        "status": order.status,
+        "lines": list(balances.values()),
+        "receipts": [
+            {**receipt.model_dump(), "lines": [line.model_dump() for line in receipt.lines]}
+            for receipt in result.scalars().all()
+        ],
+    }
+
 # ============= VENDOR BILL ENDPOINTS =============
 
 @router.get("/vendor-bills", response_model=List[VendorBillResponse])
 async def get_vendor_bills(
+    response: Response,
+    status: Optional[InvoiceStatus] = None,
+    vendor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    include_lines: bool = True,
+    page: PageParams = Depends(),
     session: AsyncSession = Depends(get_session),
 ):
-    """Get all vendor bills"""
-    result = await session.execute(
-        select(VendorBill)
-        .options(selectinload(VendorBill.vendor), selectinload(VendorBill.lines))
-        .order_by(VendorBill.id.desc())
+    """List vendor bills with vendor and (optionally) lines"""
+    query = select(VendorBill).options(
+        selectinload(VendorBill.vendor), lines_option(VendorBill.lines, include_lines)
     )
-    return result.scalars().all()
+    query = VENDOR_BILL_LIST.filter(query, status, vendor_id, date_from, date_to)
+    return await paginate(session, query, response, page, VENDOR_BILL_LIST.sort_fields)
 
 @router.get("/vendor-bills/{bill_id}", response_model=VendorBillResponse)
 async def get_vendor_bill(
@@ -887,6 +1281,7 @@ async def update_vendor_bill(
     session.add(bill)
     await session.commit()
     await session.refresh(bill)
+    await aging_cache.invalidate("payables")
     return bill
 
 @router.delete("/vendor-bills/{bill_id}")
@@ -901,17 +1296,35 @@ async def delete_vendor_bill(
     
     await session.delete(bill)
     await session.commit()
+    await aging_cache.invalidate("payables")
     return {"message": "Vendor bill deleted successfully"}
 
 # ============= PAYMENT ENDPOINTS =============
 
 @router.get("/payments")
 async def get_payments(
+    response: Response,
+    status: Optional[PaymentStatus] = None,
+    invoice_id: Optional[int] = None,
+    vendor_bill_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    page: PageParams = Depends(),
     session: AsyncSession = Depends(get_session),
 ):
-    """Get all payments"""
-    result = await session.execute(select(Payment).order_by(Payment.id.desc()))
-    return result.scalars().all()
+    """List payments"""
+    query = select(Payment)
+    if status:
+        query = query.where(Payment.status == status)
+    if invoice_id:
+        query = query.where(Payment.invoice_id == invoice_id)
+    if vendor_bill_id:
+        query = query.where(Payment.vendor_bill_id == vendor_bill_id)
+    query = date_range(query, Payment.payment_date, date_from, date_to)
+    return await paginate(session, query, response, page, {
+        "id": Payment.id, "payment_date": Payment.payment_date,
+        "amount": Payment.amount, "created_at": Payment.created_at,
+    })
 
 @router.get("/payments/{payment_id}")
 async def get_payment(
@@ -924,46 +1337,128 @@ async def get_payment(
         raise HTTPException(status_code=404, detail="Payment not found")
     return payment
 
+# Applies summed payment amounts to invoices or bills in one statement. Balance and
+# status are computed from the row's current value inside the UPDATE, so concurrent
+# postings to the same document serialize on the row lock instead of losing updates.
+POST_PAYMENTS_SQL = """
+    UPDATE {table} SET
+        amount_paid = {table}.amount_paid + v.amount,
+        status = CASE
+            WHEN {table}.status = 'CANCELLED' THEN {table}.status
+            WHEN {table}.amount_paid + v.amount >= {table}.total_amount THEN 'PAID'
+            WHEN {table}.amount_paid + v.amount > 0 THEN 'PARTIAL'
+            ELSE {table}.status
+        END
+    FROM {source}
+    WHERE {table}.id = v.document_id
+    RETURNING id, amount_paid, total_amount, status
+"""
+
+async def post_payment_amounts(session: AsyncSession, table: str, amounts: dict, label: str) -> dict:
+    """Add {document_id: amount} to amount_paid. Raises 404 (caller rolls back) for unknown ids."""
+    if not amounts:
+        return {}
+    source, params = values_subquery(
+        "v", [("document_id", "INTEGER"), ("amount", "DOUBLE PRECISION")], amounts.items()
+    )
+    result = await session.execute(text(POST_PAYMENTS_SQL.format(table=table, source=source)), params)
+    documents = {
+        row.id: {"id": row.id, "amount_paid": row.amount_paid, "total_amount": row.total_amount,
+                 "status": InvoiceStatus[row.status]}
+        for row in result
+    }
+    missing = sorted(set(amounts) - set(documents))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"{label} not found: {', '.join(map(str, missing))}")
+    return documents
+
+async def post_payments(
+    session: AsyncSession,
+    payments: List[PaymentCreate],
+    status: PaymentStatus = PaymentStatus.DRAFT,
+    number_prefix: str = "PAY",
+    statement_lines: Optional[List[str]] = None,
+) -> List[dict]:
+    """
+    Insert payments and settle their invoices / bills in the caller's transaction.
+    Payments are numbered `<number_prefix>-<id>` after the insert, so concurrent
+    batches can never collide on the unique payment number.
+    """
+    # Unique placeholders until the ids are known
+    payment_numbers = [f"{number_prefix}-{uuid.uuid4().hex}" for _ in payments]
+    # Plain rows through a Core multi-row INSERT; ORM objects cost more than the write itself in large batches
+    records = [
+        {**payment_data.model_dump(), "payment_number": number, "status": status}
+        for number, payment_data in zip(payment_numbers, payments)
+    ]
+    if statement_lines is not None:
+        for record, statement_line in zip(records, statement_lines):
+            record["statement_line"] = statement_line
+
+    invoice_amounts, bill_amounts = {}, {}
+    for payment in payments:
+        if payment.invoice_id:
+            invoice_amounts[payment.invoice_id] = invoice_amounts.get(payment.invoice_id, 0.0) + payment.amount
+        if payment.vendor_bill_id:
+            bill_amounts[payment.vendor_bill_id] = bill_amounts.get(payment.vendor_bill_id, 0.0) + payment.amount
+    await post_payment_amounts(session, "invoice", invoice_amounts, "Invoice")
+    await post_payment_amounts(session, "vendorbill", bill_amounts, "Vendor bill")
+    # After the document updates, so an unknown id is a 404 rather than a foreign key error
+    table = Payment.__table__
+    result = await session.execute(insert(table).returning(*table.c), records)
+    rows = sorted((dict(row._mapping) for row in result), key=lambda row: row["id"])
+    await session.execute(
+        update(table)
+        .where(table.c.id.in_([row["id"] for row in rows]))
+        .values(payment_number=literal(f"{number_prefix}-") + cast(table.c.id, String))
+    )
+    for row in rows:
+        row["payment_number"] = f"{number_prefix}-{row['id']}"
+    return rows
+
+async def invalidate_payment_ledgers(payments: List[PaymentCreate]):
+    ledgers = []
+    if any(payment.invoice_id for payment in payments):
+        ledgers.append("receivables")
+    if any(payment.vendor_bill_id for payment in payments):
+        ledgers.append("payables")
+    if ledgers:
+        await aging_cache.invalidate(*ledgers)
+
 @router.post("/payments", status_code=201)
 async def create_payment(
     payment_data: PaymentCreate,
     session: AsyncSession = Depends(get_session),
 ):
-    """Create a new payment"""
-    # Generate payment number
-    payment_number = f"PAY-{int(datetime.utcnow().timestamp())}"
-    
-    # Create payment
-    payment = Payment(
-        payment_number=payment_number,
-        **payment_data.model_dump(),
-        status=PaymentStatus.DRAFT
-    )
-    session.add(payment)
-    await session.commit()
-    await session.refresh(payment)
-    
-    # Update invoice/bill if linked
-    if payment.invoice_id:
-        invoice = await session.get(Invoice, payment.invoice_id)
-        if invoice:
-            invoice.amount_paid += payment.amount
-            if invoice.amount_paid >= invoice.total_amount:
-                invoice.status = InvoiceStatus.PAID
-            session.add(invoice)
-            await session.commit()
-    
-    if payment.vendor_bill_id:
-        bill = await session.get(VendorBill, payment.vendor_bill_id)
-        if bill:
-            bill.amount_paid += payment.amount
-            if bill.amount_paid >= bill.total_amount:
-                bill.status = InvoiceStatus.PAID
-            session.add(bill)
-            await session.commit()
-    
+    """Record a payment and apply it to its invoice / bill in one transaction"""
+    try:
+        payment, = await post_payments(session, [payment_data])
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    await invalidate_payment_ledgers([payment_data])
     return payment
 
+@router.post("/payments/bulk", status_code=201)
+async def create_payments_bulk(
+    data: PaymentBulkCreate,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Post a batch of payments (e.g. a bank settlement file) atomically: all payments
+    are inserted and each invoice / bill is updated once with the batch's total for it.
+    """
+    try:
+        payments = await post_payments(session, data.payments)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    await invalidate_payment_ledgers(data.payments)
+    print(f"✅ Posted {len(payments)} payments")
+    return payments
+
 @router.put("/payments/{payment_id}")
 async def update_payment(
     payment_id: int,
@@ -0,0 +1,179 @@
+"""
+Receivables / payables aging
+Outstanding balances per contact, bucketed by days past due, computed by one
+grouped query over open invoices (AR) or vendor bills (AP). The filter matches
+the partial indexes from migration 4, so only unpaid documents are read.
+
+Results are cached per (ledger, as_of date) for AGING_CACHE_TTL_SECONDS, at most
+AGING_CACHE_SIZE reports per worker (least recently used go first). Invoice,
+bill and payment writes call aging_cache.invalidate(), which clears the ledger
+here and, via the event bus, on every other worker.
+"""
+import os
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import get_session
+from event_bus import EventBus
+from models import Contact, Invoice, VendorBill
+
+AGING_CACHE_TTL_SECONDS = float(os.getenv("AGING_CACHE_TTL_SECONDS", "300"))
+AGING_CACHE_SIZE = int(os.getenv("AGING_CACHE_SIZE", "64"))
+AGING_CHANNEL = "appareldesk_aging"
+
+# Must stay identical to the migration 4 index predicate so the planner can use it.
+# Enum columns are stored by member name.
+OPEN_DOCUMENT_PREDICATE = "status IN ('CONFIRMED', 'PARTIAL')"
+
+# (label, lower bound of days past due); the last bucket is open-ended
+BUCKETS = (("current", None), ("1_30", 1), ("31_60", 31), ("61_90", 61), ("over_90", 91))
+
+LEDGERS = {
+    "receivables": (Invoice, Invoice.customer_id, Invoice.invoice_date),
+    "payables": (VendorBill, VendorBill.vendor_id, VendorBill.bill_date),
+}
+
+router = APIRouter(prefix="/admin/reports/aging", tags=["reports"])
+
+
+class AgingCache:
+    """LRU + TTL map of (ledger, as_of) -> report, with cross-worker invalidation."""
+
+    def __init__(self, ttl: float = AGING_CACHE_TTL_SECONDS, max_size: int = AGING_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[Tuple[str, date], Tuple[float, dict]]" = OrderedDict()
+        self.bus: Optional[EventBus] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def attach(self, bus: EventBus):
+        """Listen for invalidations from other workers. Must run before bus.start()."""
+        self.bus = bus
+        bus.subscribe(AGING_CHANNEL, self._on_invalidate)
+
+    def get(self, ledger: str, as_of: date) -> Optional[dict]:
+        key = (ledger, as_of)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, ledger: str, as_of: date, report: dict):
+        if self.ttl <= 0:
+            return
+        key = (ledger, as_of)
+        self.entries[key] = (time.monotonic() + self.ttl, report)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def invalidate(self, *ledgers: str):
+        """Drop cached reports for the given ledgers (all when none given) on every worker."""
+        ledgers = ledgers or tuple(LEDGERS)
+        self._drop(ledgers)
+        self.invalidations += 1
+        if self.bus is None:
+            return
+        try:
+            await self.bus.publish(AGING_CHANNEL, {"ledgers": list(ledgers)})
+        except Exception as e:
+            # Other workers fall back to the TTL
+            print(f"⚠️ Aging cache invalidation not published: {e}")
+
+    def clear(self):
+        self.entries.clear()
+
+    async def _on_invalidate(self, payload: dict):
+        self._drop(payload.get("ledgers") or tuple(LEDGERS))
+
+    def _drop(self, ledgers):
+        for key in [key for key in self.entries if key[0] in ledgers]:
+            del self.entries[key]
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl,
+        }
+
+
+async def compute_aging(session: AsyncSession, ledger: str, as_of: date) -> dict:
+    model, contact_column, document_date = LEDGERS[ledger]
+    balance = model.total_amount - model.amount_paid
+    # Documents without a due date are due on their document date
+    due = func.coalesce(model.due_date, document_date)
+
+    # Bucket edges as dates, so the CASE needs no dialect-specific date arithmetic
+    bucket_columns = []
+    for index, (label, min_days) in enumerate(BUCKETS):
+        if min_days is None:
+            condition = due >= as_of
+        else:
+            condition = due <= as_of - timedelta(days=min_days)
+            if index + 1 < len(BUCKETS):
+                condition = condition & (due > as_of - timedelta(days=BUCKETS[index + 1][1]))
+        bucket_columns.append(func.sum(case((condition, balance), else_=0.0)).label(label))
+
+    result = await session.execute(
+        select(
+            contact_column.label("contact_id"),
+            Contact.name.label("contact_name"),
+            func.count().label("documents"),
+            *bucket_columns,
+            func.sum(balance).label("total"),
+        )
+        .join(Contact, Contact.id == contact_column)
+        .where(text(f"{model.__tablename__}.{OPEN_DOCUMENT_PREDICATE}"), balance > 0)
+        .group_by(contact_column, Contact.name)
+        .order_by(func.sum(balance).desc(), contact_column)
+    )
+    contacts = [dict(row._mapping) for row in result]
+    labels = [label for label, _ in BUCKETS] + ["total"]
+    return {
+        "ledger": ledger,
+        "as_of": as_of,
+        "buckets": [label for label, _ in BUCKETS],
+        "totals": {label: round(sum(row[label] for row in contacts), 2) for label in labels},
+        "contacts": contacts,
+    }
+
+
+@router.get("/{ledger}")
+async def get_aging(
+    ledger: str,
+    as_of: Optional[date] = Query(None, description="Age balances as of this date (default today)"),
+    session: AsyncSession = Depends(get_session),
+):
+    """AR (`receivables`) or AP (`payables`) aging per contact: current, 1-30, 31-60, 61-90, over 90 days past due"""
+    if ledger not in LEDGERS:
+        raise HTTPException(status_code=404, detail=f"Unknown ledger '{ledger}'. Available: {', '.join(LEDGERS)}")
+    as_of = as_of or date.today()
+    report = aging_cache.get(ledger, as_of)
+    if report is None:
+        report = await compute_aging(session, ledger, as_of)
+        aging_cache.put(ledger, as_of, report)
+    return report
+
+
+# Global instance
+aging_cache = AgingCache()
@@ -1,27 +1,33 @@
 import os
+import hashlib
 import json
+import secrets
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from pydantic import BaseModel
+from sqlalchemy import delete, or_, update
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from db import get_session
-from models import User, Contact, UserRole, ContactType
-from dotenv import load_dotenv
+from models import User, Contact, UserRole, ContactType, RefreshToken
+from passwords import hasher
+from principal_cache import principal_cache
+from throttling import login_throttle
 
 # --- FIX: Load SECRET_KEY from environment variables ---
-load_dotenv()
+# backend/.env is already loaded by db.py on import
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     raise ValueError("❌ SECRET_KEY is missing! Check your backend/.env file.")
 
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -70,9 +76,53 @@ def verify_admin_credentials(email: str, password: str):
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
+    # jti gives each token its own principal cache entry
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a fast unsalted hash is enough
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_tokens(session: AsyncSession, user: User, role: str, family_id: Optional[str] = None) -> dict:
+    """Create a short-lived access token plus a new refresh token (in `family_id` when rotating)."""
+    now = datetime.utcnow()
+    # Prune the user's dead rows; rotated ones stay until expiry for reuse detection
+    await session.execute(
+        delete(RefreshToken).where(
+            RefreshToken.user_id == user.id,
+            or_(RefreshToken.revoked_at.is_not(None), RefreshToken.expires_at <= now),
+        )
+    )
+    refresh_token = secrets.token_urlsafe(32)
+    session.add(RefreshToken(
+        token_hash=hash_refresh_token(refresh_token),
+        family_id=family_id or uuid.uuid4().hex,
+        user_id=user.id,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    await session.commit()
+
+    access_token = create_access_token(
+        data={"sub": user.email, "role": role},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "role": role,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+async def revoke_refresh_tokens(session: AsyncSession, *conditions):
+    await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.revoked_at.is_(None), *conditions)
+        .values(revoked_at=datetime.utcnow())
+    )
+    await session.commit()
+
 async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -80,12 +130,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSe
         if email is None: raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
-    
+
+    jti = payload.get("jti")
+    user = principal_cache.get(email, jti, session)
+    if user is not None:
+        return user
+
     statement = select(User).where(User.email == email)
     # --- FIX: Use session.execute and scalars().first() ---
     result = await session.execute(statement)
     user = result.scalars().first()
     if user is None: raise HTTPException(status_code=401, detail="User not found")
+    principal_cache.put(email, jti, user)
     return user
 
 # --- Registration Endpoint (Transactional) ---
@@ -104,6 +160,10 @@ async def register(
             status_code=403, 
             detail="Admin accounts cannot be created via signup. Contact system administrator."
         )
+    # Hash before touching the database, so no connection is held while queued
+    # for the hash pool; a saturated pool raises 503 here
+    hashed_pw = await hasher.hash(password)
+
     # 1. Check if user exists
     # --- FIX: Use session.execute and scalars().first() ---
     result = await session.execute(select(User).where(User.email == email))
@@ -121,7 +181,6 @@ async def register(
         await session.flush() # Flush to get the ID for the foreign key
         
         # Create User linked to Contact
-        hashed_pw = pwd_context.hash(password)
         new_user = User(
             email=email, 
             hashed_password=hashed_pw, 
@@ -134,29 +193,42 @@ async def register(
         await session.refresh(new_user)
         # --- FIX 4: Return the actual role that was created ---
         return {"status": "success", "user_id": new_user.id, "role": role.value}
+    except HTTPException:
+        await session.rollback()
+        raise
     except Exception as e:
         await session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Login Endpoint ---
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
+    await login_throttle.check(request, form_data.username)
     statement = select(User).where(User.email == form_data.username)
     # --- FIX: Use session.execute and scalars().first() ---
     result = await session.execute(statement)
     user = result.scalars().first()
     
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+    if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    valid, new_hash = await hasher.verify_and_update(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
+        await principal_cache.invalidate(user.email)
     
-    access_token = create_access_token(data={"sub": user.email, "role": user.role.value})
-    return {"access_token": access_token, "token_type": "bearer", "role": user.role.value}
+    return await issue_tokens(session, user, user.role.value)
 
 
 # --- Admin Login Endpoint (validates against admins.json) ---
 @router.post("/admin/login")
-async def admin_login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
+async def admin_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
     """Admin login - validates credentials against admins.json file."""
+    await login_throttle.check(request, form_data.username)
     # Verify against admins.json
     admin = verify_admin_credentials(form_data.username, form_data.password)
     if not admin:
@@ -167,6 +239,8 @@ async def admin_login(form_data: OAuth2PasswordRequestForm = Depends(), session:
     user = result.scalars().first()
     
     if not user:
+        # Hash outside the try so a saturated hash pool surfaces as its 503, not a 500
+        hashed_pw = await hasher.hash(form_data.password)
         # Create the admin user and contact in database
         try:
             new_contact = Contact(
@@ -177,7 +251,6 @@ async def admin_login(form_data: OAuth2PasswordRequestForm = Depends(), session:
             session.add(new_contact)
             await session.flush()
             
-            hashed_pw = pwd_context.hash(form_data.password)
             user = User(
                 email=form_data.username,
                 hashed_password=hashed_pw,
@@ -187,23 +260,71 @@ async def admin_login(form_data: OAuth2PasswordRequestForm = Depends(), session:
             session.add(user)
             await session.commit()
             await session.refresh(user)
+        except HTTPException:
+            await session.rollback()
+            raise
         except Exception as e:
             await session.rollback()
             raise HTTPException(status_code=500, detail=f"Error creating admin user: {str(e)}")
     else:
-        # Update password hash if it changed in admins.json
-        if not pwd_context.verify(form_data.password, user.hashed_password):
-            user.hashed_password = pwd_context.hash(form_data.password)
+        # Update password hash if it changed in admins.json or was made at another cost
+        valid, new_hash = await hasher.verify_and_update(form_data.password, user.hashed_password)
+        if not valid:
+            new_hash = await hasher.hash(form_data.password)
+        if new_hash:
+            user.hashed_password = new_hash
             session.add(user)
             await session.commit()
+            await principal_cache.invalidate(user.email)
     
-    access_token = create_access_token(data={"sub": user.email, "role": UserRole.ADMIN.value})
-    return {"access_token": access_token, "token_type": "bearer", "role": UserRole.ADMIN.value}
+    return await issue_tokens(session, user, UserRole.ADMIN.value)
 
 
-# --- Profile Endpoints ---
-from pydantic import BaseModel
+# --- Refresh Token Endpoints ---
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
+@router.post("/refresh")
+async def refresh(body: RefreshRequest, session: AsyncSession = Depends(get_session)):
+    """Exchange a refresh token for a new access/refresh pair. No password hashing involved."""
+    result = await session.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(body.refresh_token))
+    )
+    stored = result.scalars().first()
+    now = datetime.utcnow()
+    if stored is None or stored.revoked_at is not None or stored.expires_at <= now:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    # Claim the token atomically so two concurrent refreshes cannot both rotate it
+    claimed = await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.rotated_at.is_(None))
+        .values(rotated_at=now)
+    )
+    if claimed.rowcount != 1:
+        # A rotated token came back: assume it leaked and end the whole session
+        await revoke_refresh_tokens(session, RefreshToken.family_id == stored.family_id)
+        print(f"⚠️ Refresh token reuse detected for user {stored.user_id}, session revoked")
+        raise HTTPException(status_code=401, detail="Refresh token already used")
+
+    user = await session.get(User, stored.user_id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return await issue_tokens(session, user, user.role.value, family_id=stored.family_id)
+
+@router.post("/logout")
+async def logout(body: RefreshRequest, session: AsyncSession = Depends(get_session)):
+    """Revoke the session the refresh token belongs to."""
+    result = await session.execute(
+        select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_refresh_token(body.refresh_token))
+    )
+    family_id = result.scalars().first()
+    if family_id is not None:
+        await revoke_refresh_tokens(session, RefreshToken.family_id == family_id)
+    return {"status": "success"}
+
+
+# --- Profile Endpoints ---
 class ProfileUpdate(BaseModel):
     name: str | None = None
     phone: str | None = None
@@ -258,6 +379,7 @@ async def update_profile(
     session.add(contact)
     await session.commit()
     await session.refresh(contact)
+    await principal_cache.invalidate(current_user.email)
     
     return {
         "status": "success",
@@ -273,14 +395,18 @@ async def change_password(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session)
 ):
-    """Change user's password."""
+    """Change user's password. Returns a fresh token pair for the calling device."""
     # Verify current password
-    if not pwd_context.verify(password_data.current_password, current_user.hashed_password):
+    if not await hasher.verify(password_data.current_password, current_user.hashed_password):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update password
-    current_user.hashed_password = pwd_context.hash(password_data.new_password)
+    current_user.hashed_password = await hasher.hash(password_data.new_password)
     session.add(current_user)
     await session.commit()
+    await principal_cache.invalidate(current_user.email)
+    # Revoke every session, then start a new one for this device only
+    await revoke_refresh_tokens(session, RefreshToken.user_id == current_user.id)
+    tokens = await issue_tokens(session, current_user, current_user.role.value)
     
-    return {"status": "success", "message": "Password changed successfully"}
\ No newline at end of file
+    return {"status": "success", "message": "Password changed successfully", **tokens}
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Query plan benchmark for the hot endpoint queries in orders.py, admin_api.py and stock_alerts.py.
+
+Prints the planner output and timing for each query, applies pending migrations,
+then prints them again so the effect of new indexes is visible side by side.
+
+Usage:
+    python bench_queries.py                 # plans at current version, migrate, plans again
+    python bench_queries.py --from-scratch  # revert index-only migrations first (drops their indexes!)
+    python bench_queries.py --analyze       # EXPLAIN ANALYZE on PostgreSQL (actually runs the queries)
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlmodel import select
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db import engine
+from migrations import run_migrations
+from models import (
+    Product, SaleOrder, SaleOrderLine, Invoice, InvoiceLine,
+    PurchaseOrderLine, VendorBillLine, Payment
+)
+from stock_alerts import DEFAULT_LOW_STOCK_THRESHOLD
+
+SAMPLE_ID = 1
+SAMPLE_IDS = list(range(1, 51))
+
+
+def endpoint_queries() -> List[Tuple[str, object]]:
+    """The WHERE clauses each endpoint actually issues, with representative parameters."""
+    return [
+        ("orders.get_my_orders",
+         select(SaleOrder).where(SaleOrder.customer_id == SAMPLE_ID).order_by(SaleOrder.id.desc())),
+        ("orders.get_my_invoices",
+         select(Invoice).where(Invoice.customer_id == SAMPLE_ID).order_by(Invoice.id.desc())),
+        ("orders.get_order_detail (lines)",
+         select(SaleOrderLine).where(SaleOrderLine.order_id == SAMPLE_ID)),
+        ("orders.get_order_detail (invoice)",
+         select(Invoice).where(Invoice.sale_order_id == SAMPLE_ID)),
+        ("orders.get_invoice_detail (lines)",
+         select(InvoiceLine).where(InvoiceLine.invoice_id == SAMPLE_ID)),
+        ("admin_api.get_sales_orders (selectinload lines)",
+         select(SaleOrderLine).where(SaleOrderLine.order_id.in_(SAMPLE_IDS))),
+        ("admin_api.get_invoices (selectinload lines)",
+         select(InvoiceLine).where(InvoiceLine.invoice_id.in_(SAMPLE_IDS))),
+        ("admin_api.get_purchase_orders (selectinload lines)",
+         select(PurchaseOrderLine).where(PurchaseOrderLine.purchase_order_id.in_(SAMPLE_IDS))),
+        ("admin_api.get_vendor_bills (selectinload lines)",
+         select(VendorBillLine).where(VendorBillLine.bill_id.in_(SAMPLE_IDS))),
+        ("admin_api.delete_product (reference check)",
+         select(SaleOrderLine.id).where(SaleOrderLine.product_id == SAMPLE_ID).limit(1)),
+        ("admin_api invoice payments",
+         select(Payment).where(Payment.invoice_id == SAMPLE_ID)),
+        ("catalog by category",
+         select(Product).where(Product.category == "Men's Shirts")),
+        ("stock_alerts.check_low_stock",
+         select(Product).where(Product.current_stock <= DEFAULT_LOW_STOCK_THRESHOLD)),
+    ]
+
+
+def explain_prefix(dialect: str, analyze: bool) -> str:
+    if dialect == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    return "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+
+
+async def capture_plans(analyze: bool) -> List[Tuple[str, str, float]]:
+    dialect = engine.dialect.name
+    prefix = explain_prefix(dialect, analyze)
+    plans = []
+    async with engine.connect() as conn:
+        for label, query in endpoint_queries():
+            sql = str(query.compile(engine.sync_engine, compile_kwargs={"literal_binds": True}))
+            started = time.perf_counter()
+            result = await conn.execute(text(prefix + sql))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            # SQLite returns (id, parent, notused, detail); PostgreSQL returns one text column
+            lines = [str(row[-1]) for row in result]
+            plans.append((label, "\n".join(lines), elapsed_ms))
+    return plans
+
+
+def print_plans(title: str, plans: List[Tuple[str, str, float]]):
+    print(f"\n{'=' * 20} {title} {'=' * 20}")
+    for label, plan, elapsed_ms in plans:
+        print(f"\n▶ {label}  ({elapsed_ms:.2f} ms)")
+        for line in plan.splitlines():
+            print(f"    {line}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-scratch", action="store_true",
+                        help="revert every index-only migration before capturing the 'before' plans; "
+                             "column migrations stay applied, so no data is dropped")
+    parser.add_argument("--analyze", action="store_true", help="use EXPLAIN ANALYZE (PostgreSQL only)")
+    args = parser.parse_args()
+
+    if args.from_scratch:
+        await run_migrations(engine, target=0, keep_irreversible=True)
+
+    before = await capture_plans(args.analyze)
+    print_plans("BEFORE", before)
+
+    applied = await run_migrations(engine)
+    after = await capture_plans(args.analyze)
+    print_plans(f"AFTER (applied: {applied or 'none'})", after)
+
+    print("\n📊 Summary")
+    for (label, plan_before, _), (_, plan_after, _) in zip(before, after):
+        changed = "changed" if plan_before != plan_after else "same"
+        print(f"  {label:<55} {changed}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
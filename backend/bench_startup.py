@@ -0,0 +1,101 @@
+"""
+Startup time benchmark and budget check.
+
+Imports the app in a fresh interpreter with `python -X importtime`, reports the
+cumulative import time of every backend module and the heaviest third-party
+packages, and exits non-zero when the app import exceeds the budget or pulls in
+the ML stack (torch / transformers) at import time.
+
+Usage:
+    python bench_startup.py                 # import main, budget from STARTUP_BUDGET_SECONDS (default 1.0)
+    python bench_startup.py --budget 0.5
+    python bench_startup.py --module orders # any backend module
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).parent
+BACKEND_MODULES = {p.stem for p in BACKEND_DIR.glob("*.py")}
+ML_PACKAGES = ("torch", "transformers")
+DEFAULT_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+
+
+def run_importtime(module: str) -> Tuple[List[Tuple[str, int, int, int]], float]:
+    """Returns [(name, depth, self_us, cumulative_us)] and the wall time of the child process."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"❌ Importing {module} failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows, wall
+
+
+def summarize(rows: List[Tuple[str, int, int, int]]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    app_modules: Dict[str, int] = {}
+    packages: Dict[str, int] = {}
+    for name, depth, _, cumulative in rows:
+        if name in BACKEND_MODULES:
+            app_modules[name] = max(app_modules.get(name, 0), cumulative)
+        elif "." not in name:
+            packages[name] = max(packages.get(name, 0), cumulative)
+    return app_modules, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="seconds")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows, wall = run_importtime(args.module)
+    # ru_maxrss is in kilobytes on Linux
+    rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    app_modules, packages = summarize(rows)
+
+    print(f"\n📦 Backend modules (cumulative import time)")
+    for name, cumulative in sorted(app_modules.items(), key=lambda item: -item[1]):
+        print(f"  {name:<24} {cumulative / 1000:>9.1f} ms")
+
+    print(f"\n📚 Heaviest packages")
+    for name, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        if name not in BACKEND_MODULES:
+            print(f"  {name:<24} {cumulative / 1000:>9.1f} ms")
+
+    import_seconds = app_modules.get(args.module, 0) / 1_000_000
+    print(f"\n⏱️  import {args.module}: {import_seconds:.3f} s (process wall {wall:.3f} s, max RSS {rss_mb:.0f} MB)")
+
+    failures = []
+    loaded_ml = [pkg for pkg in ML_PACKAGES if pkg in packages]
+    if loaded_ml:
+        failures.append(f"ML stack imported at startup: {', '.join(loaded_ml)}")
+    if import_seconds > args.budget:
+        failures.append(f"import took {import_seconds:.3f} s, budget is {args.budget:.3f} s")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ Within startup budget ({args.budget:.3f} s)")
+
+
+if __name__ == "__main__":
+    main()
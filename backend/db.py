@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from sqlmodel import SQLModel
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -21,19 +22,45 @@ if DATABASE_URL:
     elif DATABASE_URL.startswith("postgresql://") and "+asyncpg" not in DATABASE_URL:
         DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-# --- DEBUG PRINT ---
-print(f"\n[DB DEBUG] Connecting to: {DATABASE_URL}\n")
-
 if not DATABASE_URL:
     raise ValueError("❌ DATABASE_URL is missing! Check your backend/.env file or Railway environment variables.")
 
 # --- 3. Create Engine ---
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+# SQL logging is opt-in: echoing every statement is slow and floods worker logs
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO, future=True)
 
 async_session_maker = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+def dialect_insert(table):
+    """INSERT with .on_conflict_do_update() for the engine's dialect."""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"INSERT ... ON CONFLICT is not supported on {engine.dialect.name}")
+
+def values_subquery(alias: str, columns, rows):
+    """
+    `(SELECT column1 AS a, ... FROM (VALUES ...)) AS alias` for UPDATE ... FROM, plus its
+    bind parameters. columns is [(name, SQL type), ...]. VALUES columns are called
+    column1..N on both Postgres and SQLite, and every placeholder is CAST so Postgres
+    can type NULLs.
+    """
+    params = {}
+    tuples = []
+    for i, row in enumerate(rows):
+        placeholders = []
+        for (name, sql_type), value in zip(columns, row):
+            key = f"{alias}_{name}_{i}"
+            params[key] = value
+            placeholders.append(f"CAST(:{key} AS {sql_type})")
+        tuples.append(f"({', '.join(placeholders)})")
+    names = ", ".join(f"column{j + 1} AS {name}" for j, (name, _) in enumerate(columns))
+    return f"(SELECT {names} FROM (VALUES {', '.join(tuples)}) AS {alias}_rows) AS {alias}", params
+
 async def get_session() -> AsyncSession:
     async with async_session_maker() as session:
         yield session
@@ -41,4 +68,8 @@ async def get_session() -> AsyncSession:
 async def init_db():
     async with engine.begin() as conn:
         # Create tables if they don't exist
-        await conn.run_sync(SQLModel.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    # Apply indexes / changes to existing tables that create_all does not touch
+    from migrations import run_migrations
+    await run_migrations(engine)
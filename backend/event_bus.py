@@ -0,0 +1,142 @@
+"""
+Cross-worker event bus
+Carries real-time events (stock changes, new orders) between uvicorn workers so
+every worker can push them to its own websocket clients.
+
+Backends:
+- memory:   in-process only, for tests and single-worker dev servers
+- postgres: LISTEN/NOTIFY on the application database; each worker keeps one
+            dedicated listener connection and receives its own notifications too
+
+EVENT_BUS_BACKEND=auto (default) picks postgres when DATABASE_URL points at
+PostgreSQL and memory otherwise.
+"""
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "auto").lower()
+EVENT_BUS_RECONNECT_SECONDS = float(os.getenv("EVENT_BUS_RECONNECT_SECONDS", "2"))
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class EventBus:
+    """Publish/subscribe by channel name. Payloads are JSON-serialisable dicts."""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, channel: str, handler: Handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def publish(self, channel: str, payload: dict):
+        raise NotImplementedError
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def _dispatch(self, channel: str, payload: dict):
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(payload)
+            except Exception as e:
+                print(f"❌ Event handler error on '{channel}': {e}")
+
+
+class InMemoryEventBus(EventBus):
+    """Delivers events to handlers in this process only."""
+
+    async def publish(self, channel: str, payload: dict):
+        await self._dispatch(channel, payload)
+
+
+class PostgresEventBus(EventBus):
+    """
+    Publishes with pg_notify() through the shared SQLAlchemy engine and listens on
+    a dedicated asyncpg connection. Notifications are delivered only after the
+    publishing transaction commits, and in commit order, to every listening worker.
+    """
+
+    def __init__(self, dsn: str, engine=None):
+        super().__init__()
+        self.dsn = dsn
+        self.engine = engine
+        self._listener_task: Optional[asyncio.Task] = None
+        self._connection = None
+        self._stopping = False
+
+    async def publish(self, channel: str, payload: dict):
+        from sqlalchemy import text
+
+        message = json.dumps(payload, separators=(",", ":"))
+        if len(message.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            raise ValueError(f"Event payload too large for NOTIFY ({len(message)} bytes)")
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": message})
+            await conn.commit()
+
+    async def start(self):
+        self._stopping = False
+        self._listener_task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        self._stopping = True
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            print(f"⚠️ Ignoring malformed event on '{channel}'")
+            return
+        asyncio.create_task(self._dispatch(channel, data))
+
+    async def _listen_forever(self):
+        import asyncpg
+
+        while not self._stopping:
+            closed = asyncio.Event()
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                self._connection.add_termination_listener(lambda conn: closed.set())
+                for channel in self._handlers:
+                    await self._connection.add_listener(channel, self._on_notification)
+                print(f"✅ Event bus listening on {', '.join(self._handlers) or 'no channels'}")
+                await closed.wait()
+                print("⚠️ Event bus listener connection lost, reconnecting...")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Event bus listener error: {e}")
+            await asyncio.sleep(EVENT_BUS_RECONNECT_SECONDS)
+
+
+def create_event_bus(backend: str = EVENT_BUS_BACKEND) -> EventBus:
+    from db import DATABASE_URL, engine
+
+    if backend == "auto":
+        backend = "postgres" if DATABASE_URL.startswith("postgresql") else "memory"
+    if backend == "memory":
+        return InMemoryEventBus()
+    if backend == "postgres":
+        # asyncpg takes a plain libpq-style DSN
+        dsn = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        return PostgresEventBus(dsn, engine)
+    raise ValueError(f"Unknown EVENT_BUS_BACKEND: {backend}")
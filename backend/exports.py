@@ -0,0 +1,168 @@
+"""
+Streaming CSV / NDJSON exports
+Finance exports (a year of invoices, every payment) stream straight from a
+server-side cursor: rows are fetched EXPORT_YIELD_PER at a time and written out
+in ~64 KB chunks, so memory stays flat and the first bytes leave immediately,
+however many rows match.
+
+    GET /admin/exports/invoices?format=csv&date_from=2025-04-01&date_to=2026-03-31
+    GET /admin/exports/payments?format=ndjson&status=confirmed
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterator, Dict, Optional, Type
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+
+from db import engine
+from models import (
+    Contact, SaleOrder, OrderStatus, Invoice, InvoiceStatus,
+    VendorBill, Payment, PaymentStatus
+)
+
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+router = APIRouter(prefix="/admin/exports", tags=["exports"])
+
+
+class ExportSpec:
+    """A flat, id-ordered query plus the columns its filters apply to."""
+
+    def __init__(self, query, id_column, date_column, status_column, status_enum: Type[Enum]):
+        self.query = query
+        self.id_column = id_column
+        self.date_column = date_column
+        self.status_column = status_column
+        self.status_enum = status_enum
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "sales-orders": ExportSpec(
+        select(
+            SaleOrder.id, SaleOrder.order_number, SaleOrder.order_date, SaleOrder.delivery_date,
+            SaleOrder.customer_id, Contact.name.label("customer_name"), SaleOrder.status,
+            SaleOrder.tax_amount, SaleOrder.discount_amount, SaleOrder.total_amount, SaleOrder.created_at,
+        ).join(Contact, Contact.id == SaleOrder.customer_id),
+        SaleOrder.id, SaleOrder.order_date, SaleOrder.status, OrderStatus,
+    ),
+    "invoices": ExportSpec(
+        select(
+            Invoice.id, Invoice.invoice_number, Invoice.invoice_date, Invoice.due_date,
+            Invoice.sale_order_id, Invoice.customer_id, Contact.name.label("customer_name"), Invoice.status,
+            Invoice.tax_amount, Invoice.total_amount, Invoice.amount_paid,
+            (Invoice.total_amount - Invoice.amount_paid).label("balance_due"), Invoice.created_at,
+        ).join(Contact, Contact.id == Invoice.customer_id),
+        Invoice.id, Invoice.invoice_date, Invoice.status, InvoiceStatus,
+    ),
+    "vendor-bills": ExportSpec(
+        select(
+            VendorBill.id, VendorBill.bill_number, VendorBill.bill_date, VendorBill.due_date,
+            VendorBill.purchase_order_id, VendorBill.vendor_id, Contact.name.label("vendor_name"), VendorBill.status,
+            VendorBill.tax_amount, VendorBill.total_amount, VendorBill.amount_paid,
+            (VendorBill.total_amount - VendorBill.amount_paid).label("balance_due"), VendorBill.created_at,
+        ).join(Contact, Contact.id == VendorBill.vendor_id),
+        VendorBill.id, VendorBill.bill_date, VendorBill.status, InvoiceStatus,
+    ),
+    "payments": ExportSpec(
+        select(
+            Payment.id, Payment.payment_number, Payment.payment_date, Payment.amount,
+            Payment.payment_method, Payment.reference, Payment.status,
+            Payment.invoice_id, Invoice.invoice_number, Payment.vendor_bill_id, VendorBill.bill_number,
+            Payment.created_at,
+        )
+        .outerjoin(Invoice, Invoice.id == Payment.invoice_id)
+        .outerjoin(VendorBill, VendorBill.id == Payment.vendor_bill_id),
+        Payment.id, Payment.payment_date, Payment.status, PaymentStatus,
+    ),
+}
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+async def _rows(query) -> AsyncIterator[tuple]:
+    """Yield rows from a server-side cursor on a connection owned by the stream."""
+    async with engine.connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=EXPORT_YIELD_PER))
+        yield tuple(result.keys())
+        async for row in result:
+            yield tuple(row)
+
+
+async def stream_csv(query) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    async for row in _rows(query):
+        writer.writerow([_plain(value) for value in row])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def stream_ndjson(query) -> AsyncIterator[str]:
+    columns = None
+    lines = []
+    size = 0
+    async for row in _rows(query):
+        if columns is None:
+            columns = row
+            continue
+        line = json.dumps({column: _plain(value) for column, value in zip(columns, row)}, separators=(",", ":"))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "\n".join(lines) + "\n"
+            lines, size = [], 0
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Stream sales-orders, invoices, vendor-bills or payments as CSV or NDJSON."""
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{dataset}'. Available: {', '.join(EXPORTS)}")
+
+    query = spec.query
+    if status:
+        try:
+            query = query.where(spec.status_column == spec.status_enum(status))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid status '{status}'")
+    if date_from:
+        query = query.where(spec.date_column >= date_from)
+    if date_to:
+        query = query.where(spec.date_column <= date_to)
+    query = query.order_by(spec.id_column)
+
+    filename = f"{dataset}-{date.today().isoformat()}.{format}"
+    if format == "csv":
+        body, media_type = stream_csv(query), "text/csv"
+    else:
+        body, media_type = stream_ndjson(query), "application/x-ndjson"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,285 @@
+"""
+Bulk product and contact import
+Upload a CSV (header row) or NDJSON file; rows are validated and written in
+chunks of IMPORT_CHUNK_ROWS with one multi-row INSERT ... ON CONFLICT DO UPDATE
+per chunk, each in its own transaction.
+
+Upsert keys:
+- products: `id` when the row has one (update that product), otherwise a new product
+- contacts: `email`
+
+Updates only touch the columns a row provides: a CSV without a `current_stock`
+column (or with an empty cell) leaves the stored stock alone.
+
+Invalid rows are skipped and reported with their line number; valid rows in
+the same chunk are still imported. Reading, decoding and validating happen in a
+worker thread one chunk at a time, so a large file does not block the event
+loop. Search and visual-search caches are refreshed once at the end.
+"""
+import asyncio
+import codecs
+import csv
+import json
+import os
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Type
+
+from fastapi import APIRouter, File, Query, UploadFile
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import select, text
+
+from db import dialect_insert, engine
+from models import Contact, ContactType, Product, ProductType
+from websocket_manager import manager
+
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "1000"))
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+router = APIRouter(prefix="/admin/imports", tags=["imports"])
+
+
+# ============= ROW SCHEMAS =============
+
+class ProductImportRow(BaseModel):
+    id: Optional[int] = None
+    name: str = Field(min_length=1)
+    description: Optional[str] = None
+    price: float = Field(ge=0)
+    current_stock: int = Field(default=0, ge=0)
+    category: Optional[str] = None
+    product_type: ProductType = ProductType.STORABLE
+    image_url: Optional[str] = None
+
+
+class ContactImportRow(BaseModel):
+    name: str = Field(min_length=1)
+    email: str = Field(min_length=3)
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    contact_type: ContactType = ContactType.CUSTOMER
+
+
+# ============= PARSING =============
+
+def read_rows(upload: UploadFile, format: Optional[str]) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, raw dict) without loading the whole file."""
+    if format is None:
+        format = "ndjson" if (upload.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+    lines = codecs.iterdecode(upload.file, "utf-8-sig")
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Empty cells mean "not provided" so model defaults apply
+            yield reader.line_num, {key: value for key, value in record.items() if key and value not in ("", None)}
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {"__error__": f"Invalid JSON: {e.msg}"}
+
+
+def chunks(rows: Iterator[Tuple[int, dict]], size: int) -> Iterator[List[Tuple[int, dict]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def error(self, line: int, message):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def validate_chunk(chunk: List[Tuple[int, dict]], schema: Type[BaseModel], report: ImportReport) -> List[Tuple[int, BaseModel]]:
+    valid = []
+    for line, raw in chunk:
+        report.rows += 1
+        if "__error__" in raw:
+            report.error(line, raw["__error__"])
+            continue
+        try:
+            valid.append((line, schema.model_validate(raw)))
+        except ValidationError as e:
+            report.error(line, [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()])
+    return valid
+
+
+def _next_valid_chunk(pending: Iterator[List[Tuple[int, dict]]], schema: Type[BaseModel],
+                      report: ImportReport) -> Optional[List[Tuple[int, BaseModel]]]:
+    chunk = next(pending, None)
+    return None if chunk is None else validate_chunk(chunk, schema, report)
+
+
+async def validated_chunks(upload: UploadFile, format: Optional[str], schema: Type[BaseModel],
+                           report: ImportReport) -> AsyncIterator[List[Tuple[int, BaseModel]]]:
+    """Read and validate the upload IMPORT_CHUNK_ROWS rows at a time, off the event loop."""
+    pending = chunks(read_rows(upload, format), IMPORT_CHUNK_ROWS)
+    while True:
+        valid = await asyncio.to_thread(_next_valid_chunk, pending, schema, report)
+        if valid is None:
+            return
+        if valid:
+            yield valid
+
+
+# ============= UPSERTS =============
+
+def group_by_columns(rows: Dict[object, BaseModel]) -> Dict[frozenset, List[BaseModel]]:
+    """Group rows by the columns they actually provide, so an update only sets those."""
+    groups: Dict[frozenset, List[BaseModel]] = {}
+    for row in rows.values():
+        groups.setdefault(frozenset(row.model_fields_set), []).append(row)
+    return groups
+
+
+async def upsert_products(rows: List[ProductImportRow]) -> List[dict]:
+    """
+    Returns id / current_stock / category / previous_stock of products whose stock
+    was set (for the stock broadcast); previous_stock is None for new products.
+    """
+    table = Product.__table__
+    # Later rows win when a file repeats an id; ON CONFLICT cannot touch a row twice
+    by_id: Dict[int, ProductImportRow] = {}
+    new_rows = []
+    for row in rows:
+        if row.id is None:
+            new_rows.append({**row.model_dump(exclude={"id"}), "version_id": 1})
+        else:
+            by_id[row.id] = row
+
+    updated = []
+    async with engine.begin() as conn:
+        if new_rows:
+            await conn.execute(dialect_insert(table).values(new_rows))
+        for columns, group in group_by_columns(by_id).items():
+            # Defaults only fill the INSERT side (new ids); existing products keep
+            # every column the file does not have, current_stock included
+            statement = dialect_insert(table).values([{**row.model_dump(), "version_id": 1} for row in group])
+            excluded = statement.excluded
+            set_ = {column: excluded[column] for column in columns if column != "id"}
+            # Bump the optimistic lock so in-flight ORM edits see the change
+            set_["version_id"] = table.c.version_id + 1
+            statement = statement.on_conflict_do_update(index_elements=[table.c.id], set_=set_)
+            if "current_stock" in columns:
+                # Locked until commit, so the low-stock crossing is computed from the real prior value
+                result = await conn.execute(
+                    select(table.c.id, table.c.current_stock)
+                    .where(table.c.id.in_([row.id for row in group]))
+                    .with_for_update()
+                )
+                previous = {row.id: row.current_stock for row in result}
+                statement = statement.returning(table.c.id, table.c.current_stock, table.c.category)
+                result = await conn.execute(statement)
+                updated.extend({**row._mapping, "previous_stock": previous.get(row.id)} for row in result)
+            else:
+                await conn.execute(statement)
+            if engine.dialect.name == "postgresql":
+                # Explicit ids for new rows do not advance the serial sequence
+                await conn.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('product', 'id'), "
+                    "(SELECT COALESCE(MAX(id), 1) FROM product))"
+                ))
+    return updated
+
+
+async def upsert_contacts(rows: List[ContactImportRow]):
+    table = Contact.__table__
+    by_email = {row.email.strip(): row for row in rows}
+    async with engine.begin() as conn:
+        for columns, group in group_by_columns(by_email).items():
+            statement = dialect_insert(table).values([
+                {**row.model_dump(), "email": row.email.strip()} for row in group
+            ])
+            excluded = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.email],
+                set_={column: excluded[column] for column in columns if column != "email"},
+            )
+            await conn.execute(statement)
+
+
+def refresh_catalog_caches():
+    """Core statements bypass the ORM flush hooks, so invalidate caches by hand."""
+    from search import contact_index, product_index
+    from visual_search import invalidate_product_embeddings
+
+    product_index.dirty = True
+    contact_index.dirty = True
+    invalidate_product_embeddings()
+
+
+# ============= ENDPOINTS =============
+
+@router.post("/products")
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+):
+    """Create or update products from CSV / NDJSON. Rows with an `id` update that product."""
+    report = ImportReport()
+    stock_updates = []
+    async for valid in validated_chunks(file, format, ProductImportRow, report):
+        try:
+            updated = await upsert_products([row for _, row in valid])
+        except Exception as e:
+            for line, _ in valid:
+                report.error(line, f"Chunk rejected by the database: {e}")
+            continue
+        report.imported += len(valid)
+        stock_updates.extend(
+            {"product_id": row["id"], "new_stock": row["current_stock"], "category": row["category"],
+             "previous_stock": row["previous_stock"]}
+            for row in updated
+        )
+
+    if report.imported:
+        refresh_catalog_caches()
+    if stock_updates:
+        # One coalesced STOCK_BATCH window for every updated product
+        await manager.broadcast_stock_updates(stock_updates)
+    print(f"✅ Product import: {report.imported} imported, {report.failed} failed")
+    return report.as_dict()
+
+
+@router.post("/contacts")
+async def import_contacts(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+):
+    """Create or update contacts from CSV / NDJSON, matched by email."""
+    report = ImportReport()
+    async for valid in validated_chunks(file, format, ContactImportRow, report):
+        try:
+            await upsert_contacts([row for _, row in valid])
+        except Exception as e:
+            for line, _ in valid:
+                report.error(line, f"Chunk rejected by the database: {e}")
+            continue
+        report.imported += len(valid)
+
+    if report.imported:
+        refresh_catalog_caches()
+    print(f"✅ Contact import: {report.imported} imported, {report.failed} failed")
+    return report.as_dict()
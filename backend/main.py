@@ -8,11 +8,23 @@ from auth import router as auth_router
 from orders import router as orders_router
 from admin_api import router as admin_router
 from websocket_manager import manager
-from visual_search import router as visual_search_router
+from event_bus import create_event_bus
+from passwords import hasher
+from principal_cache import principal_cache
+from throttling import login_throttle
+from visual_search import router as visual_search_router, VISUAL_SEARCH_ENABLED
 from stock_alerts import router as stock_alerts_router
+from search import router as search_router, admin_router as admin_search_router
+from exports import router as exports_router
+from imports import router as imports_router
+from rollups import router as rollups_router, rebuild_rollups
+from aging import router as aging_router, aging_cache
+from reconciliation import router as reconciliation_router
+from summaries import router as summaries_router
+from forecasting import router as forecasting_router, forecast_cache
 from seed import seed_database
 from sqlmodel import SQLModel
-from db import engine
+from db import engine, async_session_maker
 
 app = FastAPI(title="ApparelDesk API")
 
@@ -45,19 +57,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],  # Admin list pagination
 )
 
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    # One bus listener per worker fans events out to this worker's sockets
+    bus = create_event_bus()
+    principal_cache.attach(bus)
+    aging_cache.attach(bus)
+    await manager.start(bus)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await manager.stop()
+    hasher.shutdown()
 
 app.include_router(auth_router)
 app.include_router(orders_router)
 app.include_router(admin_router)
-app.include_router(visual_search_router)
+app.include_router(search_router)
+app.include_router(admin_search_router)
+app.include_router(exports_router)
+app.include_router(imports_router)
+app.include_router(rollups_router)
+app.include_router(aging_router)
+app.include_router(reconciliation_router)
+app.include_router(summaries_router)
+app.include_router(forecasting_router)
+if VISUAL_SEARCH_ENABLED:
+    app.include_router(visual_search_router)
 app.include_router(stock_alerts_router)
 
+async def refresh_rollups():
+    # The seeder writes orders directly, bypassing the incremental rollup hooks
+    async with async_session_maker() as session:
+        await rebuild_rollups(session)
+        await session.commit()
+
 # --- Seed Database Endpoint ---
 @app.post("/api/seed")
 async def trigger_seed():
@@ -67,6 +106,9 @@ async def trigger_seed():
     """
     try:
         await seed_database()
+        await refresh_rollups()
+        await aging_cache.invalidate()
+        forecast_cache.clear()
         return {"message": "Database seeded successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Seeding failed: {str(e)}")
@@ -84,26 +126,63 @@ async def trigger_reset_and_seed():
         async with engine.begin() as conn:
             await conn.run_sync(SQLModel.metadata.drop_all)
         
-        # Recreate all tables
-        async with engine.begin() as conn:
-            await conn.run_sync(SQLModel.metadata.create_all)
+        # Recreate all tables and re-apply migrations
+        await init_db()
         
         # Seed the database
         await seed_database()
+        await refresh_rollups()
+
+        # User ids were reused by the reseed; other workers expire theirs by TTL
+        principal_cache.clear()
+        await aging_cache.invalidate()
+        forecast_cache.clear()
         
         return {"message": "Database reset and seeded successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Reset and seed failed: {str(e)}")
 
+# --- Runtime Metrics ---
+@app.get("/api/metrics")
+async def get_metrics():
+    """In-process counters for this worker (real-time fan-out, password hashing pool, principal cache etc.)."""
+    return {
+        "realtime": manager.metrics(),
+        "passwords": hasher.metrics(),
+        "principals": principal_cache.metrics(),
+        "login_throttle": login_throttle.metrics(),
+        "aging_cache": aging_cache.metrics(),
+        "forecast_cache": forecast_cache.metrics(),
+    }
+
 # --- WebSocket Endpoint for Admin ---
 @app.websocket("/ws/admin")
 async def websocket_endpoint(websocket: WebSocket):
     # In a real app, validate Admin Token in query param here
     # token = websocket.query_params.get("token")
-    await manager.connect(websocket)
+    # A reconnecting dashboard passes ?epoch=...&last_seq=... to resume before live events
+    last_seq = websocket.query_params.get("last_seq")
+    await manager.connect(
+        websocket,
+        epoch=websocket.query_params.get("epoch"),
+        last_seq=int(last_seq) if last_seq and last_seq.isdigit() else None,
+    )
+    try:
+        while True:
+            # Topic subscribe/unsubscribe requests (anything else is ignored)
+            message = await websocket.receive_text()
+            await manager.handle_message(websocket, message)
+    except Exception:
+        manager.disconnect(websocket)
+
+# --- Public WebSocket Endpoint for Storefront Stock ---
+@app.websocket("/ws/stock")
+async def public_stock_endpoint(websocket: WebSocket):
+    # Read-only: clients can only choose which product ids to watch
+    await manager.public.connect(websocket)
     try:
         while True:
-            # Keep connection alive, maybe listen for admin pings
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            await manager.public.handle_message(websocket, message)
     except Exception:
-        manager.disconnect(websocket)
\ No newline at end of file
+        manager.public.disconnect(websocket)
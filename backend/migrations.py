@@ -0,0 +1,417 @@
+"""
+Versioned schema migrations
+Applies ordered DDL steps on top of SQLModel.metadata.create_all.
+
+create_all only creates missing tables, so anything added to an existing table
+(indexes, columns) has to ship as a migration here. Indexes are built with
+CREATE INDEX CONCURRENTLY on PostgreSQL so writes keep flowing during the build.
+
+Usage:
+    python migrations.py                # apply pending migrations
+    python migrations.py status         # list applied / pending versions
+    python migrations.py downgrade 0    # roll back to a version
+"""
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Arbitrary key so that only one worker migrates at a time on startup
+MIGRATION_LOCK_KEY = 726_026
+MIGRATION_LOCK_POLL_SECONDS = 0.5
+
+
+class IndexSpec:
+    """A single index managed by a migration."""
+
+    def __init__(self, table: str, columns: Sequence[str], name: Optional[str] = None,
+                 where: Optional[str] = None, unique: bool = False, using: Optional[str] = None,
+                 dialects: Optional[Sequence[str]] = None):
+        self.table = table
+        self.columns = list(columns)
+        # Same naming scheme SQLModel uses for Field(index=True), so a fresh
+        # create_all and a migrated database end up with identical indexes
+        self.name = name or f"ix_{table}_{'_'.join(self.columns)}"
+        self.where = where
+        self.unique = unique
+        # Index method (e.g. gin) and the dialects it exists on; None means everywhere
+        self.using = using
+        self.dialects = dialects
+
+    @property
+    def reversible(self) -> bool:
+        return not self.columns
+
+    def applies_to(self, dialect: str) -> bool:
+        return self.dialects is None or dialect in self.dialects
+
+    def create_sql(self, dialect: str) -> str:
+        concurrently = " CONCURRENTLY" if dialect == "postgresql" else ""
+        unique = "UNIQUE " if self.unique else ""
+        sql = (
+            f"CREATE {unique}INDEX{concurrently} IF NOT EXISTS {self.name} "
+            f"ON {self.table}{f' USING {self.using}' if self.using else ''} ({', '.join(self.columns)})"
+        )
+        if self.where:
+            sql += f" WHERE {self.where}"
+        return sql
+
+    def drop_sql(self, dialect: str) -> str:
+        concurrently = " CONCURRENTLY" if dialect == "postgresql" else ""
+        return f"DROP INDEX{concurrently} IF EXISTS {self.name}"
+
+
+class ColumnSpec:
+    """
+    A nullable column added to an existing table by a migration. Columns hold
+    data, so they are never dropped again: a migration with columns cannot be
+    reverted.
+    """
+
+    def __init__(self, table: str, name: str, type_sql: str):
+        self.table = table
+        self.name = name
+        self.type_sql = type_sql
+
+    def add_sql(self) -> str:
+        return f"ALTER TABLE {self.table} ADD COLUMN {self.name} {self.type_sql}"
+
+
+class Migration:
+    """
+    An ordered schema change. `columns` are added first (skipped when create_all
+    already made them), then `up` runs as plain SQL before `indexes` are built
+    concurrently; revert drops the indexes, then runs `down`. Migrations with
+    `columns` are irreversible. `dialects` limits `up`/`down` to the listed dialects.
+    """
+
+    def __init__(self, version: int, name: str, indexes: Sequence[IndexSpec] = (),
+                 up: Sequence[str] = (), down: Sequence[str] = (),
+                 dialects: Optional[Sequence[str]] = None, columns: Sequence[ColumnSpec] = ()):
+        self.version = version
+        self.name = name
+        self.columns = list(columns)
+        self.indexes = list(indexes)
+        self.up = list(up)
+        self.down = list(down)
+        self.dialects = dialects
+
+    @property
+    def reversible(self) -> bool:
+        return not self.columns
+
+    def runs_sql_on(self, dialect: str) -> bool:
+        return self.dialects is None or dialect in self.dialects
+
+
+# ============= MIGRATIONS =============
+# Append new migrations at the end with the next version number. Never edit or
+# reorder a migration that has already shipped.
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="foreign key and filter indexes",
+        indexes=[
+            # Order / invoice lines loaded per document (orders.py, admin_api selectinload)
+            IndexSpec("saleorderline", ["order_id"]),
+            IndexSpec("invoiceline", ["invoice_id"]),
+            IndexSpec("purchaseorderline", ["purchase_order_id"]),
+            IndexSpec("vendorbillline", ["bill_id"]),
+            # Product reference checks in admin_api.delete_product
+            IndexSpec("saleorderline", ["product_id"]),
+            IndexSpec("invoiceline", ["product_id"]),
+            # Customer history (orders.get_my_orders / get_my_invoices, get_order_detail)
+            IndexSpec("saleorder", ["customer_id"]),
+            IndexSpec("invoice", ["customer_id"]),
+            IndexSpec("invoice", ["sale_order_id"]),
+            # Payments by document
+            IndexSpec("payment", ["invoice_id"]),
+            IndexSpec("payment", ["vendor_bill_id"]),
+            # Catalog filters and stock_alerts low stock scans
+            IndexSpec("product", ["category"]),
+            IndexSpec("product", ["current_stock"]),
+        ],
+    ),
+    Migration(
+        version=2,
+        name="keyset pagination indexes",
+        indexes=[
+            # Vendor filters on the purchase side
+            IndexSpec("purchaseorder", ["vendor_id"]),
+            IndexSpec("vendorbill", ["vendor_id"]),
+            # (sort column, id) pairs walked by pagination.paginate
+            IndexSpec("saleorder", ["order_date", "id"]),
+            IndexSpec("invoice", ["invoice_date", "id"]),
+            IndexSpec("purchaseorder", ["order_date", "id"]),
+            IndexSpec("vendorbill", ["bill_date", "id"]),
+            IndexSpec("payment", ["payment_date", "id"]),
+            IndexSpec("product", ["name", "id"]),
+            IndexSpec("contact", ["name", "id"]),
+            # Status filters in default (id desc) order
+            IndexSpec("saleorder", ["status", "id"]),
+            IndexSpec("invoice", ["status", "id"]),
+            IndexSpec("purchaseorder", ["status", "id"]),
+            IndexSpec("vendorbill", ["status", "id"]),
+            IndexSpec("payment", ["status", "id"]),
+        ],
+    ),
+    Migration(
+        version=3,
+        name="product and contact search indexes",
+        # Other databases use the in-memory index in search.py
+        dialects=["postgresql"],
+        up=["CREATE EXTENSION IF NOT EXISTS pg_trgm"],
+        indexes=[
+            # Expressions must stay identical to PRODUCT_DOCUMENT / CONTACT_DOCUMENT in search.py
+            IndexSpec(
+                "product",
+                ["(setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                 "setweight(to_tsvector('simple', coalesce(category, '')), 'B') || "
+                 "setweight(to_tsvector('simple', coalesce(description, '')), 'C'))"],
+                name="ix_product_search_document", using="gin", dialects=["postgresql"],
+            ),
+            IndexSpec("product", ["lower(name) gin_trgm_ops"],
+                      name="ix_product_name_trgm", using="gin", dialects=["postgresql"]),
+            IndexSpec(
+                "contact",
+                ["(setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                 "setweight(to_tsvector('simple', coalesce(email, '') || ' ' || coalesce(phone, '')), 'B'))"],
+                name="ix_contact_search_document", using="gin", dialects=["postgresql"],
+            ),
+            IndexSpec("contact", ["(lower(name || ' ' || email || ' ' || coalesce(phone, ''))) gin_trgm_ops"],
+                      name="ix_contact_search_trgm", using="gin", dialects=["postgresql"]),
+        ],
+    ),
+    Migration(
+        version=4,
+        name="open invoice and bill indexes for aging",
+        indexes=[
+            # Predicate must stay identical to OPEN_DOCUMENT_PREDICATE in aging.py
+            IndexSpec("invoice", ["customer_id", "due_date"], name="ix_invoice_open_customer_due",
+                      where="status IN ('CONFIRMED', 'PARTIAL')"),
+            IndexSpec("vendorbill", ["vendor_id", "due_date"], name="ix_vendorbill_open_vendor_due",
+                      where="status IN ('CONFIRMED', 'PARTIAL')"),
+        ],
+    ),
+    Migration(
+        version=5,
+        name="remaining keyset sort indexes",
+        indexes=[
+            # (sort column, id) pairs for every other sort key the admin lists accept
+            IndexSpec("product", ["price", "id"]),
+            IndexSpec("product", ["current_stock", "id"]),
+            IndexSpec("product", ["created_at", "id"]),
+            IndexSpec("contact", ["created_at", "id"]),
+            IndexSpec("saleorder", ["total_amount", "id"]),
+            IndexSpec("saleorder", ["created_at", "id"]),
+            IndexSpec("invoice", ["total_amount", "id"]),
+            IndexSpec("invoice", ["created_at", "id"]),
+            IndexSpec("purchaseorder", ["total_amount", "id"]),
+            IndexSpec("purchaseorder", ["created_at", "id"]),
+            IndexSpec("vendorbill", ["total_amount", "id"]),
+            IndexSpec("vendorbill", ["created_at", "id"]),
+            IndexSpec("payment", ["amount", "id"]),
+            IndexSpec("payment", ["created_at", "id"]),
+        ],
+    ),
+    Migration(
+        version=6,
+        name="bank statement line fingerprints on payments",
+        # Irreversible: dropping the fingerprints would let a re-uploaded statement post twice
+        columns=[ColumnSpec("payment", "statement_line", "VARCHAR")],
+        indexes=[
+            # One payment per statement line: re-uploading a statement posts nothing twice
+            IndexSpec("payment", ["statement_line"], unique=True),
+        ],
+    ),
+    Migration(
+        version=7,
+        name="category snapshot on sale order lines",
+        # Irreversible: retract_order subtracts under the stored category; losing it would
+        # make category rollups drift whenever a product was recategorized
+        columns=[ColumnSpec("saleorderline", "category", "VARCHAR")],
+        up=[
+            # Existing lines take the product's current category (rollups.UNCATEGORIZED when unset)
+            "UPDATE saleorderline SET category = ("
+            "SELECT coalesce(product.category, 'Uncategorized') FROM product "
+            "WHERE product.id = saleorderline.product_id) WHERE category IS NULL",
+        ],
+    ),
+]
+
+
+# ============= RUNNER =============
+
+async def _acquire_lock(conn: AsyncConnection, dialect: str):
+    """
+    Poll with pg_try_advisory_lock instead of blocking in pg_advisory_lock: a backend
+    blocked inside that statement holds a snapshot, CREATE INDEX CONCURRENTLY in the
+    lock holder waits for it, and Postgres reports a deadlock.
+    """
+    if dialect != "postgresql":
+        return
+    while True:
+        result = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        if result.scalar():
+            return
+        await asyncio.sleep(MIGRATION_LOCK_POLL_SECONDS)
+
+
+async def _release_lock(conn: AsyncConnection, dialect: str):
+    if dialect == "postgresql":
+        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+async def _ensure_migrations_table(conn: AsyncConnection):
+    from models import SchemaMigration
+    await conn.run_sync(lambda sync_conn: SchemaMigration.__table__.create(sync_conn, checkfirst=True))
+
+
+async def _applied_versions(conn: AsyncConnection) -> List[int]:
+    result = await conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))
+    return [row[0] for row in result]
+
+
+async def _drop_invalid_index(conn: AsyncConnection, index: IndexSpec):
+    """A failed CONCURRENTLY build leaves an INVALID index behind that IF NOT EXISTS would skip."""
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": index.name},
+    )
+    if result.first():
+        print(f"⚠️  Dropping invalid index {index.name} left by an interrupted build")
+        await conn.execute(text(index.drop_sql("postgresql")))
+
+
+async def _has_column(conn: AsyncConnection, column: ColumnSpec) -> bool:
+    return await conn.run_sync(
+        lambda sync_conn: any(c["name"] == column.name for c in inspect(sync_conn).get_columns(column.table))
+    )
+
+
+async def _apply(conn: AsyncConnection, migration: Migration, dialect: str):
+    for column in migration.columns:
+        if not await _has_column(conn, column):
+            await conn.execute(text(column.add_sql()))
+    if migration.runs_sql_on(dialect):
+        for statement in migration.up:
+            await conn.execute(text(statement))
+    for index in migration.indexes:
+        if not index.applies_to(dialect):
+            continue
+        if dialect == "postgresql":
+            await _drop_invalid_index(conn, index)
+        await conn.execute(text(index.create_sql(dialect)))
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+        {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()},
+    )
+
+
+async def _revert(conn: AsyncConnection, migration: Migration, dialect: str):
+    for index in reversed(migration.indexes):
+        if index.applies_to(dialect):
+            await conn.execute(text(index.drop_sql(dialect)))
+    if migration.runs_sql_on(dialect):
+        for statement in migration.down:
+            await conn.execute(text(statement))
+    await conn.execute(text("DELETE FROM schema_migrations WHERE version = :version"), {"version": migration.version})
+
+
+async def run_migrations(engine: AsyncEngine, target: Optional[int] = None,
+                         keep_irreversible: bool = False) -> List[int]:
+    """
+    Bring the schema to `target` (default: latest). Returns the versions applied
+    or reverted. CONCURRENTLY cannot run inside a transaction, so every statement
+    runs on an AUTOCOMMIT connection guarded by an advisory lock.
+
+    Going below an irreversible (column) migration raises ValueError, unless
+    `keep_irreversible` is set: then those stay applied and only the others are
+    reverted.
+    """
+    dialect = engine.dialect.name
+    if target is None:
+        target = MIGRATIONS[-1].version if MIGRATIONS else 0
+
+    changed = []
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await _acquire_lock(conn, dialect)
+        try:
+            await _ensure_migrations_table(conn)
+            applied = set(await _applied_versions(conn))
+
+            for migration in MIGRATIONS:
+                if migration.version <= target and migration.version not in applied:
+                    print(f"⬆️  Applying migration {migration.version}: {migration.name}")
+                    await _apply(conn, migration, dialect)
+                    changed.append(migration.version)
+
+            to_revert = [m for m in reversed(MIGRATIONS) if m.version > target and m.version in applied]
+            blocked = [m.version for m in to_revert if not m.reversible]
+            if blocked and not keep_irreversible:
+                raise ValueError(
+                    f"Migration(s) {', '.join(map(str, blocked))} add columns that hold data and cannot be "
+                    f"reverted; downgrade to {max(blocked)} or higher"
+                )
+            for migration in to_revert:
+                if migration.reversible:
+                    print(f"⬇️  Reverting migration {migration.version}: {migration.name}")
+                    await _revert(conn, migration, dialect)
+                    changed.append(migration.version)
+        finally:
+            await _release_lock(conn, dialect)
+    return changed
+
+
+async def migration_status(engine: AsyncEngine) -> dict:
+    async with engine.connect() as conn:
+        await _ensure_migrations_table(conn)
+        applied = await _applied_versions(conn)
+        await conn.commit()
+    return {
+        "applied": applied,
+        "pending": [m.version for m in MIGRATIONS if m.version not in applied],
+    }
+
+
+async def main(argv: List[str]):
+    from db import engine
+
+    command = argv[0] if argv else "upgrade"
+    if command == "status":
+        status = await migration_status(engine)
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version in status["applied"] else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.name}")
+    elif command == "upgrade":
+        target = int(argv[1]) if len(argv) > 1 else None
+        changed = await run_migrations(engine, target)
+        print(f"✅ Applied {len(changed)} migration(s)")
+    elif command == "downgrade":
+        if len(argv) < 2:
+            raise SystemExit("Usage: python migrations.py downgrade <version>")
+        try:
+            changed = await run_migrations(engine, int(argv[1]))
+        except ValueError as e:
+            await engine.dispose()
+            raise SystemExit(f"❌ {e}")
+        print(f"✅ Reverted {len(changed)} migration(s)")
+    else:
+        raise SystemExit(f"Unknown command: {command}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
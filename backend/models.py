@@ -73,8 +73,8 @@ class Product(SQLModel, table=True):
     name: str
     description: Optional[str] = Field(default=None, sa_column=Column(Text))
     price: float
-    current_stock: int
-    category: Optional[str] = None
+    current_stock: int = Field(index=True)
+    category: Optional[str] = Field(default=None, index=True)
     product_type: ProductType = Field(default=ProductType.STORABLE)
     image_url: Optional[str] = None
     images: Optional[str] = Field(default=None, sa_column=Column(Text))  # JSON array of image URLs
@@ -91,7 +91,7 @@ class Product(SQLModel, table=True):
 class SaleOrder(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     order_number: str = Field(unique=True, index=True)
-    customer_id: int = Field(foreign_key="contact.id")
+    customer_id: int = Field(foreign_key="contact.id", index=True)
     order_date: date = Field(default_factory=lambda: datetime.utcnow().date())
     delivery_date: Optional[date] = None
     total_amount: float
@@ -114,20 +114,22 @@ class SaleOrder(SQLModel, table=True):
 
 class SaleOrderLine(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="saleorder.id")
-    product_id: int = Field(foreign_key="product.id")
+    order_id: int = Field(foreign_key="saleorder.id", index=True)
+    product_id: int = Field(foreign_key="product.id", index=True)
     quantity: int
     unit_price: float
     tax_rate: float = 0.0
     discount: float = 0.0
+    # Product category when the order was first recorded in the sales rollups
+    category: Optional[str] = None
     
     order: SaleOrder = Relationship(back_populates="lines")
 
 class Invoice(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     invoice_number: str = Field(unique=True, index=True)
-    sale_order_id: Optional[int] = Field(default=None, foreign_key="saleorder.id")
-    customer_id: int = Field(foreign_key="contact.id")
+    sale_order_id: Optional[int] = Field(default=None, foreign_key="saleorder.id", index=True)
+    customer_id: int = Field(foreign_key="contact.id", index=True)
     invoice_date: date = Field(default_factory=lambda: datetime.utcnow().date())
     due_date: Optional[date] = None
     total_amount: float
@@ -151,8 +153,8 @@ class Invoice(SQLModel, table=True):
 
 class InvoiceLine(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    invoice_id: int = Field(foreign_key="invoice.id")
-    product_id: int = Field(foreign_key="product.id")
+    invoice_id: int = Field(foreign_key="invoice.id", index=True)
+    product_id: int = Field(foreign_key="product.id", index=True)
     description: Optional[str] = None
     quantity: int
     unit_price: float
@@ -165,7 +167,7 @@ class InvoiceLine(SQLModel, table=True):
 class PurchaseOrder(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     order_number: str = Field(unique=True, index=True)
-    vendor_id: int = Field(foreign_key="contact.id")
+    vendor_id: int = Field(foreign_key="contact.id", index=True)
     order_date: date = Field(default_factory=lambda: datetime.utcnow().date())
     expected_delivery: Optional[date] = None
     total_amount: float
@@ -177,10 +179,11 @@ class PurchaseOrder(SQLModel, table=True):
     vendor: Contact = Relationship(back_populates="vendor_purchase_orders")
     lines: List["PurchaseOrderLine"] = Relationship(back_populates="purchase_order", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
     bills: List["VendorBill"] = Relationship(back_populates="purchase_order")
+    receipts: List["PurchaseReceipt"] = Relationship(back_populates="purchase_order")
 
 class PurchaseOrderLine(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    purchase_order_id: int = Field(foreign_key="purchaseorder.id")
+    purchase_order_id: int = Field(foreign_key="purchaseorder.id", index=True)
     product_id: int = Field(foreign_key="product.id")
     quantity: int
     unit_price: float
@@ -188,13 +191,35 @@ class PurchaseOrderLine(SQLModel, table=True):
     
     purchase_order: PurchaseOrder = Relationship(back_populates="lines")
 
+# --- GOODS RECEIPTS ---
+
+class PurchaseReceipt(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    receipt_number: str = Field(unique=True, index=True)
+    purchase_order_id: int = Field(foreign_key="purchaseorder.id", index=True)
+    received_date: date = Field(default_factory=lambda: datetime.utcnow().date())
+    notes: Optional[str] = Field(default=None, sa_column=Column(Text))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    purchase_order: PurchaseOrder = Relationship(back_populates="receipts")
+    lines: List["PurchaseReceiptLine"] = Relationship(back_populates="receipt", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+
+class PurchaseReceiptLine(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    receipt_id: int = Field(foreign_key="purchasereceipt.id", index=True)
+    purchase_order_line_id: int = Field(foreign_key="purchaseorderline.id", index=True)
+    product_id: int = Field(foreign_key="product.id")
+    quantity: int
+
+    receipt: PurchaseReceipt = Relationship(back_populates="lines")
+
 # --- VENDOR BILLS ---
 
 class VendorBill(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     bill_number: str = Field(unique=True, index=True)
     purchase_order_id: Optional[int] = Field(default=None, foreign_key="purchaseorder.id")
-    vendor_id: int = Field(foreign_key="contact.id")
+    vendor_id: int = Field(foreign_key="contact.id", index=True)
     bill_date: date = Field(default_factory=lambda: datetime.utcnow().date())
     due_date: Optional[date] = None
     total_amount: float
@@ -211,7 +236,7 @@ class VendorBill(SQLModel, table=True):
 
 class VendorBillLine(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    bill_id: int = Field(foreign_key="vendorbill.id")
+    bill_id: int = Field(foreign_key="vendorbill.id", index=True)
     product_id: int = Field(foreign_key="product.id")
     description: Optional[str] = None
     quantity: int
@@ -241,11 +266,60 @@ class Payment(SQLModel, table=True):
     amount: float
     payment_method: str = "Bank Transfer"
     reference: Optional[str] = None
-    invoice_id: Optional[int] = Field(default=None, foreign_key="invoice.id")
-    vendor_bill_id: Optional[int] = Field(default=None, foreign_key="vendorbill.id")
+    invoice_id: Optional[int] = Field(default=None, foreign_key="invoice.id", index=True)
+    vendor_bill_id: Optional[int] = Field(default=None, foreign_key="vendorbill.id", index=True)
     status: PaymentStatus = Field(default=PaymentStatus.DRAFT)
     notes: Optional[str] = Field(default=None, sa_column=Column(Text))
+    # Fingerprint of the bank statement line a reconciliation posted this payment for
+    statement_line: Optional[str] = Field(default=None, unique=True, index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     invoice: Optional[Invoice] = Relationship(back_populates="payments")
-    vendor_bill: Optional[VendorBill] = Relationship(back_populates="payments")
\ No newline at end of file
+    vendor_bill: Optional[VendorBill] = Relationship(back_populates="payments")
+
+# --- REFRESH TOKENS ---
+# Only the SHA-256 of each token is stored. Every refresh rotates the token within
+# its family; presenting an already-rotated token revokes the whole family.
+class RefreshToken(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    token_hash: str = Field(unique=True, index=True)
+    family_id: str = Field(index=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+    rotated_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = None
+
+# --- SALES ROLLUPS ---
+# Daily totals over non-cancelled sale orders, kept in step by rollups.py in the
+# same transaction as the order change. Revenue is line net (qty * price - discount).
+# No foreign keys: rollup rows must not block deleting a product or contact.
+class SalesDailyProduct(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    product_id: int = Field(primary_key=True, index=True)
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0.0
+
+class SalesDailyCategory(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    category: str = Field(primary_key=True)
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0.0
+
+class SalesDailyCustomer(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    customer_id: int = Field(primary_key=True, index=True)
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0.0
+
+# --- SCHEMA MIGRATIONS ---
+
+class SchemaMigration(SQLModel, table=True):
+    __tablename__ = "schema_migrations"
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
@@ -13,6 +13,7 @@ from db import get_session
 from models import Product, SaleOrder, SaleOrderLine, Invoice, InvoiceLine, User, PaymentTerm
 from auth import get_current_user
 from websocket_manager import manager
+from rollups import record_order
 
 # --- Pydantic Schemas (Data Validation) ---
 class OrderItemSchema(BaseModel):
@@ -88,6 +89,7 @@ async def place_order(
             if product.current_stock < item.quantity:
                 raise HTTPException(status_code=400, detail=f"Insufficient stock for '{product.name}'. Available: {product.current_stock}")
 
+            previous_stock = product.current_stock
             product.current_stock -= item.quantity
             session.add(product) 
             
@@ -103,11 +105,14 @@ async def place_order(
             
             affected_products.append({
                 "id": product.id, 
-                "new_stock": product.current_stock
+                "new_stock": product.current_stock,
+                "previous_stock": previous_stock,
+                "category": product.category,
             })
 
         new_order.total_amount = total_amount
         session.add(new_order)
+        await record_order(session, new_order.id)
 
         # --- 3. Auto Invoice Logic ---
         invoice = None
@@ -157,7 +162,8 @@ async def place_order(
         raise HTTPException(status_code=500, detail=str(e))
 
     for prod in affected_products:
-        await manager.broadcast_stock_update(prod["id"], prod["new_stock"])
+        await manager.broadcast_stock_update(prod["id"], prod["new_stock"], prod["category"], prod["previous_stock"])
+    await manager.broadcast_order_event(new_order.id, new_order.order_number, total_amount, new_order.status)
 
     return {
         "status": "success", 
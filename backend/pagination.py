@@ -0,0 +1,136 @@
+"""
+Keyset pagination for admin list endpoints
+Pages are fetched with `WHERE (sort_col, id) < (last_sort_value, last_id)` instead
+of OFFSET, so every page costs one index range scan no matter how deep it is.
+
+Query parameters shared by the list routes:
+    limit   page size (default ADMIN_PAGE_DEFAULT_LIMIT, max ADMIN_PAGE_MAX_LIMIT)
+    sort    field name, prefixed with '-' for descending; id breaks ties
+    cursor  opaque token from the previous page's X-Next-Cursor header
+
+Bodies stay plain JSON arrays. When more rows exist the response carries an
+X-Next-Cursor header; its absence marks the last page.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import literal, tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+ADMIN_PAGE_DEFAULT_LIMIT = int(os.getenv("ADMIN_PAGE_DEFAULT_LIMIT", "100"))
+ADMIN_PAGE_MAX_LIMIT = int(os.getenv("ADMIN_PAGE_MAX_LIMIT", "500"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """FastAPI dependency collecting limit / cursor / sort."""
+
+    def __init__(
+        self,
+        limit: int = Query(ADMIN_PAGE_DEFAULT_LIMIT, ge=1, le=ADMIN_PAGE_MAX_LIMIT),
+        cursor: Optional[str] = Query(None, description=f"Value of the previous page's {NEXT_CURSOR_HEADER} header"),
+        sort: Optional[str] = Query(None, description="Sort field, '-' prefix for descending"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(sort: str, values: list) -> str:
+    raw = json.dumps({"s": sort, "v": [_json_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: str) -> list:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = data["v"]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if data.get("s") != sort:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+    return values
+
+
+def _coerce(column, value):
+    """Turn a JSON cursor value back into the column's Python type."""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        # e.g. SQLModel's AutoString; JSON already gives the right value
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+async def paginate(
+    session: AsyncSession,
+    query,
+    response: Response,
+    page: PageParams,
+    sort_fields: Dict[str, object],
+    default_sort: str = "-id",
+    as_rows: bool = False,
+) -> List:
+    """
+    Apply keyset ordering and the cursor to `query` and return one page of entities.
+    `sort_fields` maps allowed sort names to non-nullable columns and must contain "id".
+    With as_rows=True the query selects columns (named like the sort fields) and the
+    page is returned as plain dicts.
+    """
+    sort = page.sort or default_sort
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field not in sort_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sort by '{field}'. Allowed: {', '.join(sorted(sort_fields))}",
+        )
+    id_column = sort_fields["id"]
+    keys = [id_column] if field == "id" else [sort_fields[field], id_column]
+
+    if page.cursor:
+        raw_values = decode_cursor(page.cursor, sort)
+        if len(raw_values) != len(keys):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            values = [_coerce(key, value) for key, value in zip(keys, raw_values)]
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(keys) == 1:
+            condition = id_column < values[0] if descending else id_column > values[0]
+        else:
+            # Row-value comparison matches the (sort_col, id) index directly
+            left = tuple_(*keys)
+            right = tuple_(*[literal(value, type_=key.type) for key, value in zip(keys, values)])
+            condition = left < right if descending else left > right
+        query = query.where(condition)
+
+    query = query.order_by(*[key.desc() if descending else key.asc() for key in keys])
+    result = await session.execute(query.limit(page.limit + 1))
+    rows = [dict(row) for row in result.mappings()] if as_rows else list(result.scalars().all())
+
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        values = [last[key.key] for key in keys] if as_rows else [getattr(last, key.key) for key in keys]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, values)
+    return rows
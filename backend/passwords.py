@@ -0,0 +1,140 @@
+"""
+Password hashing off the event loop
+bcrypt is deliberately slow (~250 ms at cost 12), so hashing and verification run
+on a small dedicated thread pool instead of inside the async handlers. bcrypt
+releases the GIL while it works, so the pool gives real parallelism and the event
+loop keeps serving other requests during a login burst.
+
+The pool is bounded: at most PASSWORD_HASH_WORKERS jobs run at once and at most
+PASSWORD_HASH_MAX_PENDING wait behind them. Beyond that requests are shed with 503
+instead of queueing without limit.
+
+Changing BCRYPT_ROUNDS upgrades existing hashes on the next successful login.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = 1
+
+# min/max pinned to the configured cost so needs_update() flags hashes made at any other cost
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordPoolMetrics:
+    """Counters for /api/metrics. Only touched from the event loop thread."""
+
+    def __init__(self):
+        self.hashes = 0
+        self.verifies = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.pending = 0
+        self.max_pending = 0
+        self.wait_ms_total = 0.0
+        self.run_ms_total = 0.0
+        self.completed = 0
+
+    def as_dict(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "workers": PASSWORD_HASH_WORKERS,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "hashes": self.hashes,
+            "verifies": self.verifies,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "queue_depth": self.pending,
+            "max_queue_depth": self.max_pending,
+            "avg_wait_ms": round(self.wait_ms_total / completed, 2),
+            "avg_run_ms": round(self.run_ms_total / completed, 2),
+        }
+
+
+class PasswordHasher:
+    """Runs CryptContext calls on a bounded thread pool."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.stats = PasswordPoolMetrics()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            self._slots = asyncio.Semaphore(self.workers)
+
+        if self.stats.pending >= self.max_pending:
+            self.stats.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication is busy, please retry",
+                headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+            )
+
+        queued_at = time.perf_counter()
+        self.stats.pending += 1
+        self.stats.max_pending = max(self.stats.max_pending, self.stats.pending)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.stats.pending -= 1
+
+        started_at = time.perf_counter()
+        self.stats.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.stats.in_flight -= 1
+            self._slots.release()
+            self.stats.completed += 1
+            self.stats.wait_ms_total += (started_at - queued_at) * 1000
+            self.stats.run_ms_total += (time.perf_counter() - started_at) * 1000
+
+    async def hash(self, password: str) -> str:
+        self.stats.hashes += 1
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        self.stats.verifies += 1
+        return await self._run(pwd_context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Returns (valid, new_hash). new_hash is set when the stored hash used another cost."""
+        self.stats.verifies += 1
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed)
+        if new_hash:
+            self.stats.rehashed += 1
+        return valid, new_hash
+
+    def metrics(self) -> dict:
+        return self.stats.as_dict()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = None
+
+
+# Global instance
+hasher = PasswordHasher()
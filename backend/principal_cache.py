@@ -0,0 +1,132 @@
+"""
+Principal cache for get_current_user
+Keeps recently resolved users in memory so authenticated requests can skip the
+`SELECT ... FROM user WHERE email = ?` after the JWT is decoded.
+
+Entries are keyed by (subject, token id) and live for PRINCIPAL_CACHE_TTL_SECONDS.
+Anything that changes a user (password, profile, role) calls invalidate(), which
+drops the subject here and publishes it on the event bus so every other worker
+drops it too.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from event_bus import EventBus
+from models import User
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+PRINCIPALS_CHANNEL = "appareldesk_principals"
+
+CacheKey = Tuple[str, Optional[str]]
+
+
+class PrincipalCache:
+    """LRU + TTL map of (sub, jti) -> User column values."""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[CacheKey, Tuple[float, dict]]" = OrderedDict()
+        self.keys_by_subject: Dict[str, Set[CacheKey]] = {}
+        self.bus: Optional[EventBus] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def attach(self, bus: EventBus):
+        """Listen for invalidations from other workers. Must run before bus.start()."""
+        self.bus = bus
+        bus.subscribe(PRINCIPALS_CHANNEL, self._on_invalidate)
+
+    def get(self, sub: str, jti: Optional[str], session: AsyncSession) -> Optional[User]:
+        """Return a User attached to `session` without querying, or None on a miss."""
+        if self.ttl <= 0:
+            self.misses += 1
+            return None
+        key = (sub, jti)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        # Rebuild as a detached persistent instance so handlers can still modify
+        # and commit it through their own session
+        user = User(**entry[1])
+        make_transient_to_detached(user)
+        session.add(user)
+        return user
+
+    def put(self, sub: str, jti: Optional[str], user: User):
+        if self.ttl <= 0:
+            return
+        key = (sub, jti)
+        values = {column.name: getattr(user, column.name) for column in User.__table__.columns}
+        self.entries[key] = (time.monotonic() + self.ttl, values)
+        self.entries.move_to_end(key)
+        self.keys_by_subject.setdefault(sub, set()).add(key)
+        while len(self.entries) > self.max_size:
+            oldest, _ = self.entries.popitem(last=False)
+            self._forget_key(oldest)
+
+    async def invalidate(self, sub: str):
+        """Drop every cached token of `sub` on this worker and, via the bus, on all others."""
+        self._drop_subject(sub)
+        self.invalidations += 1
+        if self.bus is None:
+            return
+        try:
+            await self.bus.publish(PRINCIPALS_CHANNEL, {"sub": sub})
+        except Exception as e:
+            # Other workers fall back to the TTL
+            print(f"⚠️ Principal invalidation for {sub} not published: {e}")
+
+    def clear(self):
+        self.entries.clear()
+        self.keys_by_subject.clear()
+
+    async def _on_invalidate(self, payload: dict):
+        sub = payload.get("sub")
+        if sub:
+            self._drop_subject(sub)
+
+    def _drop_subject(self, sub: str):
+        keys = self.keys_by_subject.pop(sub, set())
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def _discard(self, key: CacheKey):
+        self.entries.pop(key, None)
+        self._forget_key(key)
+
+    def _forget_key(self, key: CacheKey):
+        keys = self.keys_by_subject.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_subject[key[0]]
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl,
+        }
+
+
+# Global instance
+principal_cache = PrincipalCache()
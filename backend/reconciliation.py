@@ -0,0 +1,268 @@
+"""
+Bank statement reconciliation
+Upload a statement (CSV with a header row, or NDJSON) with `date`, `amount` and
+optional `reference` / `description` columns. Money in (amount > 0) is matched
+against open invoices, money out (amount < 0) against open vendor bills.
+
+Open documents are loaded once into in-memory hash indexes:
+- by normalized document number, for lines whose reference or description
+  mentions it (partial payments allowed)
+- by amount bucket, for the rest: the remaining balance must be within
+  `amount_tolerance` and the due date within `date_window_days` of the line;
+  the closest amount, then the closest date, wins
+
+Matched lines are posted as confirmed payments (numbered REC-<payment id>)
+through the set-based payment path in chunks, all in one transaction. Each
+payment stores a fingerprint of its statement line (date, amount, reference and
+the occurrence of that triple in the file) under a unique index, so uploading
+the same statement again skips the lines already posted. Pass dry_run=true to
+preview.
+"""
+import math
+import os
+import re
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from admin_api import PaymentCreate, invalidate_payment_ledgers, post_payments
+from aging import OPEN_DOCUMENT_PREDICATE
+from db import get_session
+from imports import read_rows
+from models import Invoice, VendorBill, Payment, PaymentStatus
+
+RECONCILE_AMOUNT_TOLERANCE = float(os.getenv("RECONCILE_AMOUNT_TOLERANCE", "0.01"))
+RECONCILE_DATE_WINDOW_DAYS = int(os.getenv("RECONCILE_DATE_WINDOW_DAYS", "45"))
+RECONCILE_POST_CHUNK = 5000  # payments per set-based posting / fingerprint lookup (bind parameter limits)
+
+router = APIRouter(prefix="/admin/reconciliation", tags=["reconciliation"])
+
+REFERENCE_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9\-/_.]*")
+
+
+def normalize_reference(value: str) -> str:
+    """'inv-1700000000', 'INV 1700000000' and 'INV1700000000' all compare equal."""
+    return re.sub(r"[^A-Z0-9]", "", value.upper())
+
+
+class StatementLine(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    posted_on: date = Field(alias="date")
+    amount: float
+    reference: Optional[str] = None
+    description: Optional[str] = None
+
+
+def line_fingerprint(line: StatementLine, occurrence: int) -> str:
+    """Identity of a statement line; `occurrence` tells identical lines in one file apart."""
+    return f"{line.posted_on.isoformat()}|{line.amount:.2f}|{normalize_reference(line.reference or '')}|{occurrence}"
+
+
+class OpenDocument:
+    __slots__ = ("id", "number", "remaining", "due")
+
+    def __init__(self, id: int, number: str, remaining: float, due: date):
+        self.id = id
+        self.number = number
+        self.remaining = remaining
+        self.due = due
+
+
+class DocumentIndex:
+    """Open documents of one ledger, indexed by normalized number and by amount bucket."""
+
+    def __init__(self, documents: List[OpenDocument], tolerance: float):
+        self.tolerance = tolerance
+        # Buckets at least as wide as the tolerance: a match is always in the same or a neighbouring bucket
+        self.bucket_width = max(tolerance, 0.01)
+        self.by_number: Dict[str, OpenDocument] = {}
+        self.by_amount: Dict[int, List[OpenDocument]] = {}
+        for document in documents:
+            self.by_number[normalize_reference(document.number)] = document
+            self._index_amount(document)
+
+    def _bucket(self, amount: float) -> int:
+        return math.floor(amount / self.bucket_width)
+
+    def _index_amount(self, document: OpenDocument):
+        self.by_amount.setdefault(self._bucket(document.remaining), []).append(document)
+
+    def match_reference(self, line: StatementLine, amount: float) -> Optional[OpenDocument]:
+        candidates = [line.reference or "", *REFERENCE_TOKEN_RE.findall(f"{line.reference or ''} {line.description or ''}")]
+        for candidate in candidates:
+            document = self.by_number.get(normalize_reference(candidate)) if candidate else None
+            if document is not None and document.remaining > 0 and amount <= document.remaining + self.tolerance:
+                return document
+        return None
+
+    def match_amount(self, line: StatementLine, amount: float, window_days: int) -> Optional[OpenDocument]:
+        best, best_key = None, None
+        bucket = self._bucket(amount)
+        for key in (bucket - 1, bucket, bucket + 1):
+            for document in self.by_amount.get(key, ()):
+                # Entries go stale once a document is (partly) paid; check the live balance
+                difference = abs(document.remaining - amount)
+                if document.remaining <= 0 or difference > self.tolerance:
+                    continue
+                distance = abs((line.posted_on - document.due).days)
+                if distance > window_days:
+                    continue
+                rank = (difference, distance, document.id)
+                if best_key is None or rank < best_key:
+                    best, best_key = document, rank
+        return best
+
+    def apply(self, document: OpenDocument, amount: float):
+        document.remaining = round(document.remaining - amount, 2)
+        if document.remaining > self.tolerance:
+            self._index_amount(document)
+
+
+async def load_open_documents(session: AsyncSession, model, number_column, document_date) -> List[OpenDocument]:
+    # Same predicate as the migration 4 partial indexes
+    result = await session.execute(
+        select(
+            model.id, number_column.label("number"),
+            (model.total_amount - model.amount_paid).label("remaining"),
+            func.coalesce(model.due_date, document_date).label("due"),
+        ).where(text(f"{model.__tablename__}.{OPEN_DOCUMENT_PREDICATE}"), model.total_amount > model.amount_paid)
+    )
+    documents = []
+    for row in result:
+        due = row.due if isinstance(row.due, date) else date.fromisoformat(str(row.due)[:10])
+        documents.append(OpenDocument(row.id, row.number, round(row.remaining, 2), due))
+    return documents
+
+
+async def load_posted_fingerprints(session: AsyncSession, fingerprints: List[str]) -> set:
+    posted = set()
+    for start in range(0, len(fingerprints), RECONCILE_POST_CHUNK):
+        result = await session.execute(
+            select(Payment.statement_line).where(
+                Payment.statement_line.in_(fingerprints[start:start + RECONCILE_POST_CHUNK])
+            )
+        )
+        posted.update(result.scalars())
+    return posted
+
+
+@router.post("/statements")
+async def reconcile_statement(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    amount_tolerance: float = Query(RECONCILE_AMOUNT_TOLERANCE, ge=0, le=1000),
+    date_window_days: int = Query(RECONCILE_DATE_WINDOW_DAYS, ge=0, le=366),
+    dry_run: bool = False,
+    session: AsyncSession = Depends(get_session),
+):
+    """Match statement lines to open invoices / vendor bills and post the matches as payments"""
+    indexes = {
+        "invoice": DocumentIndex(
+            await load_open_documents(session, Invoice, Invoice.invoice_number, Invoice.invoice_date), amount_tolerance),
+        "vendor_bill": DocumentIndex(
+            await load_open_documents(session, VendorBill, VendorBill.bill_number, VendorBill.bill_date), amount_tolerance),
+    }
+
+    matches: List[dict] = []
+    unmatched: List[dict] = []
+    already_posted: List[dict] = []
+    errors: List[dict] = []
+    payments: List[Tuple[str, PaymentCreate]] = []
+    statement: List[Tuple[int, StatementLine, str]] = []
+    occurrences: Dict[str, int] = {}
+    lines = 0
+    for line_number, raw in read_rows(file, format):
+        lines += 1
+        if "__error__" in raw:
+            errors.append({"line": line_number, "error": raw["__error__"]})
+            continue
+        try:
+            line = StatementLine.model_validate(raw)
+        except ValidationError as e:
+            errors.append({"line": line_number, "error": [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]})
+            continue
+        if line.amount == 0:
+            errors.append({"line": line_number, "error": "amount must not be zero"})
+            continue
+        base = line_fingerprint(line, 0)
+        occurrences[base] = occurrences.get(base, 0) + 1
+        statement.append((line_number, line, line_fingerprint(line, occurrences[base])))
+
+    posted = await load_posted_fingerprints(session, [fingerprint for _, _, fingerprint in statement])
+    for line_number, line, fingerprint in statement:
+        if fingerprint in posted:
+            already_posted.append({
+                "line": line_number, "date": line.posted_on, "amount": line.amount, "reference": line.reference,
+            })
+            continue
+
+        document_type = "invoice" if line.amount > 0 else "vendor_bill"
+        index = indexes[document_type]
+        amount = round(abs(line.amount), 2)
+        matched_by = "reference"
+        document = index.match_reference(line, amount)
+        if document is None:
+            matched_by = "amount"
+            document = index.match_amount(line, amount, date_window_days)
+        if document is None:
+            unmatched.append({
+                "line": line_number, "date": line.posted_on, "amount": line.amount,
+                "reference": line.reference, "description": line.description,
+            })
+            continue
+
+        index.apply(document, amount)
+        matches.append({
+            "line": line_number, "amount": amount, "document_type": document_type,
+            "document_id": document.id, "document_number": document.number, "matched_by": matched_by,
+        })
+        payments.append((fingerprint, PaymentCreate(
+            payment_date=line.posted_on,
+            amount=amount,
+            reference=line.reference,
+            invoice_id=document.id if document_type == "invoice" else None,
+            vendor_bill_id=document.id if document_type == "vendor_bill" else None,
+            notes=f"Bank reconciliation, statement line {line_number}",
+        )))
+
+    if payments and not dry_run:
+        try:
+            for start in range(0, len(payments), RECONCILE_POST_CHUNK):
+                chunk = payments[start:start + RECONCILE_POST_CHUNK]
+                await post_payments(
+                    session, [payment for _, payment in chunk], status=PaymentStatus.CONFIRMED,
+                    number_prefix="REC", statement_lines=[fingerprint for fingerprint, _ in chunk],
+                )
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="Some statement lines were posted by a concurrent upload. Upload the statement again.",
+            )
+        except Exception:
+            await session.rollback()
+            raise
+        await invalidate_payment_ledgers([payment for _, payment in payments])
+        print(f"✅ Reconciled {len(payments)} of {lines} statement lines")
+
+    return {
+        "lines": lines,
+        "matched": len(matches),
+        "matched_amount": round(sum(match["amount"] for match in matches), 2),
+        "unmatched_count": len(unmatched),
+        "already_posted_count": len(already_posted),
+        "failed": len(errors),
+        "posted": bool(payments) and not dry_run,
+        "matches": matches,
+        "unmatched": unmatched,
+        "already_posted": already_posted,
+        "errors": errors,
+    }
@@ -10,6 +10,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from sqlmodel import SQLModel
 from db import engine
+from migrations import run_migrations
 # Import all models to ensure they're registered with SQLModel metadata
 from models import (
     User, Contact, Product, 
@@ -30,6 +31,9 @@ async def reset_database():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
     print("✅ All tables created")
+
+    # Record migrations against the fresh schema (indexes already exist via create_all)
+    await run_migrations(engine)
     print("\n✨ Database reset complete! You can now run seed.py")
 
 if __name__ == "__main__":
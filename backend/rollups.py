@@ -0,0 +1,276 @@
+"""
+Daily sales rollups
+Per-day totals by product, category and customer for the admin dashboard, so a
+report reads a few hundred rollup rows instead of scanning every order line.
+
+The rollups are maintained incrementally inside the order's own transaction:
+writers call retract_order() before changing an order and record_order() after
+it, so rollups commit or roll back together with the order. Cancelled orders
+contribute nothing. The first record_order() stores each line's product category
+on the line, so a later retraction subtracts from the category the line was
+counted under even if the product has been recategorized since. The column comes
+from migration 7, which is irreversible so the snapshot is never dropped.
+
+Usage:
+    python rollups.py rebuild    # backfill / recompute everything from the orders
+"""
+import asyncio
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import delete, func, insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import dialect_insert, get_session
+from models import (
+    Contact, Product, SaleOrder, SaleOrderLine, OrderStatus,
+    SalesDailyProduct, SalesDailyCategory, SalesDailyCustomer
+)
+
+UNCATEGORIZED = "Uncategorized"
+REPORT_DEFAULT_DAYS = 30
+REPORT_MAX_LIMIT = 100
+
+router = APIRouter(prefix="/admin/reports", tags=["reports"])
+
+LINE_REVENUE = SaleOrderLine.quantity * SaleOrderLine.unit_price - SaleOrderLine.discount
+CATEGORY = func.coalesce(Product.category, UNCATEGORIZED)
+# Lines recorded before their category was stored fall back to the product's
+LINE_CATEGORY = func.coalesce(SaleOrderLine.category, Product.category, UNCATEGORIZED)
+
+# (model, key columns besides day)
+ROLLUPS = (
+    (SalesDailyProduct, ("product_id",)),
+    (SalesDailyCategory, ("category",)),
+    (SalesDailyCustomer, ("customer_id",)),
+)
+
+
+# ============= INCREMENTAL UPDATES =============
+
+async def _apply_order(session: AsyncSession, order_id: int, sign: int):
+    # Pending changes are autoflushed, so this sees the order as it stands in this transaction
+    result = await session.execute(
+        select(
+            SaleOrder.order_date, SaleOrder.customer_id, SaleOrderLine.product_id,
+            LINE_CATEGORY.label("category"),
+            func.sum(SaleOrderLine.quantity).label("units"),
+            func.sum(LINE_REVENUE).label("revenue"),
+        )
+        .join(SaleOrderLine, SaleOrderLine.order_id == SaleOrder.id)
+        .join(Product, Product.id == SaleOrderLine.product_id)
+        .where(SaleOrder.id == order_id, SaleOrder.status != OrderStatus.CANCELLED)
+        .group_by(SaleOrder.order_date, SaleOrder.customer_id, SaleOrderLine.product_id, LINE_CATEGORY)
+    )
+
+    # key -> [orders, units, revenue]; one order counts once per key
+    totals: Dict[type, Dict[Tuple, list]] = {model: {} for model, _ in ROLLUPS}
+    for line in result:
+        for model, key in (
+            (SalesDailyProduct, (line.order_date, line.product_id)),
+            (SalesDailyCategory, (line.order_date, line.category)),
+            (SalesDailyCustomer, (line.order_date, line.customer_id)),
+        ):
+            current = totals[model].setdefault(key, [1, 0, 0.0])
+            current[1] += line.units
+            current[2] += line.revenue
+
+    for model, keys in ROLLUPS:
+        if not totals[model]:
+            continue
+        table = model.__table__
+        statement = dialect_insert(table).values([
+            {**dict(zip(("day", *keys), key)), "orders": sign * orders, "units": sign * units, "revenue": sign * revenue}
+            for key, (orders, units, revenue) in totals[model].items()
+        ])
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.day, *[table.c[k] for k in keys]],
+            set_={
+                "orders": table.c.orders + excluded.orders,
+                "units": table.c.units + excluded.units,
+                "revenue": table.c.revenue + excluded.revenue,
+            },
+        )
+        await session.execute(statement)
+
+
+async def _store_categories(session: AsyncSession, *conditions):
+    """Freeze the product category on lines that do not have one yet."""
+    await session.execute(
+        update(SaleOrderLine)
+        .where(SaleOrderLine.category.is_(None), *conditions)
+        .values(category=select(CATEGORY).where(Product.id == SaleOrderLine.product_id).scalar_subquery())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def record_order(session: AsyncSession, order_id: int):
+    """Add an order's lines to the rollups. Call after the order and its lines are added or changed."""
+    await _store_categories(session, SaleOrderLine.order_id == order_id)
+    await _apply_order(session, order_id, 1)
+
+
+async def retract_order(session: AsyncSession, order_id: int):
+    """Remove an order's current contribution. Call before changing or deleting it."""
+    await _apply_order(session, order_id, -1)
+
+
+# ============= REBUILD =============
+
+async def rebuild_rollups(session: AsyncSession) -> Dict[str, int]:
+    """Recompute every rollup table from the orders. The caller commits."""
+    await _store_categories(session)
+    live_lines = (
+        SaleOrderLine.order_id == SaleOrder.id,
+        SaleOrder.status != OrderStatus.CANCELLED,
+    )
+    sums = (
+        func.count(func.distinct(SaleOrder.id)),
+        func.sum(SaleOrderLine.quantity),
+        func.sum(LINE_REVENUE),
+    )
+    sources = {
+        SalesDailyProduct: select(SaleOrder.order_date, SaleOrderLine.product_id, *sums)
+            .where(*live_lines)
+            .group_by(SaleOrder.order_date, SaleOrderLine.product_id),
+        SalesDailyCategory: select(SaleOrder.order_date, LINE_CATEGORY, *sums)
+            .join(Product, Product.id == SaleOrderLine.product_id)
+            .where(*live_lines)
+            .group_by(SaleOrder.order_date, LINE_CATEGORY),
+        SalesDailyCustomer: select(SaleOrder.order_date, SaleOrder.customer_id, *sums)
+            .where(*live_lines)
+            .group_by(SaleOrder.order_date, SaleOrder.customer_id),
+    }
+
+    counts = {}
+    for model, keys in ROLLUPS:
+        await session.execute(delete(model))
+        await session.execute(
+            insert(model.__table__).from_select(["day", *keys, "orders", "units", "revenue"], sources[model])
+        )
+        result = await session.execute(select(func.count()).select_from(model))
+        counts[model.__tablename__] = result.scalar_one()
+    return counts
+
+
+# ============= REPORT ENDPOINTS =============
+
+def report_range(date_from: Optional[date], date_to: Optional[date]) -> Tuple[date, date]:
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    return date_from, date_to
+
+
+def _totals(model):
+    return (
+        func.sum(model.orders).label("orders"),
+        func.sum(model.units).label("units"),
+        func.sum(model.revenue).label("revenue"),
+    )
+
+
+@router.get("/sales")
+async def sales_summary(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """Orders, units and revenue per day plus period totals (default: last 30 days)"""
+    date_from, date_to = report_range(date_from, date_to)
+    result = await session.execute(
+        select(SalesDailyCustomer.day, *_totals(SalesDailyCustomer))
+        .where(SalesDailyCustomer.day >= date_from, SalesDailyCustomer.day <= date_to)
+        .group_by(SalesDailyCustomer.day)
+        .order_by(SalesDailyCustomer.day)
+    )
+    daily = [dict(row._mapping) for row in result]
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "orders": sum(row["orders"] for row in daily),
+        "units": sum(row["units"] for row in daily),
+        "revenue": round(sum(row["revenue"] for row in daily), 2),
+        "daily": daily,
+    }
+
+
+async def _top(session: AsyncSession, model, key, date_from, date_to, sort: str, limit: int,
+               name_model=None, name_key=None) -> List[dict]:
+    date_from, date_to = report_range(date_from, date_to)
+    columns = [key, *_totals(model)]
+    if name_model is not None:
+        columns.append(name_model.name)
+    query = select(*columns).where(model.day >= date_from, model.day <= date_to)
+    if name_model is not None:
+        query = query.outerjoin(name_model, name_key == key).group_by(key, name_model.name)
+    else:
+        query = query.group_by(key)
+    result = await session.execute(query.order_by(func.sum(getattr(model, sort)).desc(), key).limit(limit))
+    return [dict(row._mapping) for row in result]
+
+
+@router.get("/sales/products")
+async def sales_by_product(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sort: str = Query("revenue", pattern="^(revenue|units|orders)$"),
+    limit: int = Query(20, ge=1, le=REPORT_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session),
+):
+    """Top products by revenue, units or orders"""
+    return await _top(session, SalesDailyProduct, SalesDailyProduct.product_id, date_from, date_to,
+                      sort, limit, Product, Product.id)
+
+
+@router.get("/sales/categories")
+async def sales_by_category(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sort: str = Query("revenue", pattern="^(revenue|units|orders)$"),
+    limit: int = Query(20, ge=1, le=REPORT_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session),
+):
+    """Sales per product category"""
+    return await _top(session, SalesDailyCategory, SalesDailyCategory.category, date_from, date_to, sort, limit)
+
+
+@router.get("/sales/customers")
+async def sales_by_customer(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sort: str = Query("revenue", pattern="^(revenue|units|orders)$"),
+    limit: int = Query(20, ge=1, le=REPORT_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session),
+):
+    """Top customers by revenue, units or orders"""
+    return await _top(session, SalesDailyCustomer, SalesDailyCustomer.customer_id, date_from, date_to,
+                      sort, limit, Contact, Contact.id)
+
+
+@router.post("/rollups/rebuild")
+async def rebuild_sales_rollups(session: AsyncSession = Depends(get_session)):
+    """Recompute the rollup tables from all sale orders"""
+    counts = await rebuild_rollups(session)
+    await session.commit()
+    return {"message": "Sales rollups rebuilt", "rows": counts}
+
+
+async def main(argv: List[str]):
+    from db import async_session_maker, engine
+
+    command = argv[0] if argv else "rebuild"
+    if command != "rebuild":
+        raise SystemExit(f"Unknown command: {command}")
+    async with async_session_maker() as session:
+        counts = await rebuild_rollups(session)
+        await session.commit()
+    print(f"✅ Rebuilt sales rollups: {counts}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,248 @@
+"""
+Product and contact search
+Ranked, typo-tolerant prefix search for the storefront search box and the admin
+contact picker.
+
+- PostgreSQL: weighted tsvector documents (prefix tsquery) plus pg_trgm word
+  similarity for misspellings, both served by the GIN indexes from migration 3.
+- Other databases (SQLite in dev/tests): an in-memory inverted index per table,
+  built on first use and rebuilt after any flush that touches the table.
+"""
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import engine, get_session
+from models import Contact, Product
+
+SEARCH_MAX_LIMIT = 50
+MAX_QUERY_TOKENS = 8
+
+router = APIRouter(prefix="/search", tags=["search"])
+# Contacts carry email / phone, so their search lives with the other admin endpoints
+admin_router = APIRouter(prefix="/admin/search", tags=["admin"])
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(value.lower()) if value else []
+
+
+# ============= POSTGRESQL =============
+# Document expressions must match the index definitions in migration 3 exactly,
+# otherwise the planner cannot use the GIN indexes.
+
+PRODUCT_DOCUMENT = (
+    "(setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C'))"
+)
+PRODUCT_TRIGRAM = "lower(name)"
+
+CONTACT_DOCUMENT = (
+    "(setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(email, '') || ' ' || coalesce(phone, '')), 'B'))"
+)
+CONTACT_TRIGRAM = "(lower(name || ' ' || email || ' ' || coalesce(phone, '')))"
+
+PRODUCT_COLUMNS = "id, name, category, price, current_stock, image_url"
+CONTACT_COLUMNS = "id, name, email, phone, contact_type"
+
+
+def prefix_tsquery(tokens: List[str]) -> str:
+    # Tokens are \w+ only, so they are safe to splice into to_tsquery syntax
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+async def _postgres_search(session: AsyncSession, table: str, columns: str, document: str,
+                           trigram: str, q: str, tokens: List[str], limit: int) -> List[dict]:
+    statement = text(f"""
+        SELECT {columns},
+               ts_rank_cd({document}, query) + word_similarity(:q, {trigram}) AS rank
+        FROM {table}, to_tsquery('simple', :tsquery) AS query
+        WHERE {document} @@ query OR :q <% {trigram}
+        ORDER BY rank DESC, id
+        LIMIT :limit
+    """)
+    result = await session.execute(
+        statement, {"q": q.lower(), "tsquery": prefix_tsquery(tokens), "limit": limit}
+    )
+    return [dict(row._mapping) for row in result]
+
+
+# ============= IN-MEMORY FALLBACK =============
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count as one edit), capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class InMemorySearchIndex:
+    """
+    Inverted index over weighted text fields. Every query token must match a
+    document, exactly (1.0), as a prefix (0.8) or, failing both, within one or
+    two edits of a vocabulary word (up to 0.6). Trigrams narrow the vocabulary
+    before edit distances are computed.
+    """
+
+    MAX_PREFIX_EXPANSIONS = 50
+
+    def __init__(self, model, fields: Dict[str, float], columns: List[str]):
+        self.model = model
+        self.fields = fields
+        self.columns = columns
+        self.dirty = True
+        self.rows: Dict[int, dict] = {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.vocabulary: List[str] = []
+        self.trigram_index: Dict[str, Set[str]] = {}
+        self.built_at = 0.0
+
+    async def ensure_built(self, session: AsyncSession):
+        if not self.dirty:
+            return
+        # Clear first so a flush during the rebuild marks the index dirty again
+        self.dirty = False
+        result = await session.execute(select(self.model))
+        rows: Dict[int, dict] = {}
+        postings: Dict[str, Dict[int, float]] = {}
+        for entity in result.scalars():
+            rows[entity.id] = {column: getattr(entity, column) for column in self.columns}
+            for field, weight in self.fields.items():
+                for token in tokenize(getattr(entity, field)):
+                    doc_weights = postings.setdefault(token, {})
+                    doc_weights[entity.id] = max(doc_weights.get(entity.id, 0.0), weight)
+        trigram_index: Dict[str, Set[str]] = {}
+        for token in postings:
+            for gram in trigrams(token):
+                trigram_index.setdefault(gram, set()).add(token)
+        self.rows, self.postings = rows, postings
+        self.vocabulary = sorted(postings)
+        self.trigram_index = trigram_index
+        self.built_at = time.time()
+
+    def _matches(self, query_token: str) -> List[Tuple[str, float]]:
+        matches: Dict[str, float] = {}
+        if query_token in self.postings:
+            matches[query_token] = 1.0
+        start = bisect_left(self.vocabulary, query_token)
+        for token in self.vocabulary[start:start + self.MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(query_token):
+                break
+            matches.setdefault(token, 0.8)
+        if not matches and len(query_token) >= 3:
+            max_edits = 1 if len(query_token) <= 5 else 2
+            candidates: Set[str] = set()
+            for gram in trigrams(query_token):
+                candidates |= self.trigram_index.get(gram, set())
+            for token in candidates:
+                # Compare against the token's prefix too, so "shrit" still autocompletes "shirts"
+                distance = min(
+                    edit_distance(query_token, token, max_edits),
+                    edit_distance(query_token, token[:len(query_token)], max_edits),
+                )
+                if distance <= max_edits:
+                    matches[token] = 0.6 * (1 - distance / (len(query_token) + 1))
+        return list(matches.items())
+
+    def search(self, tokens: List[str], limit: int) -> List[dict]:
+        scores: Optional[Dict[int, float]] = None
+        for query_token in tokens:
+            token_scores: Dict[int, float] = {}
+            for token, match_score in self._matches(query_token):
+                for doc_id, weight in self.postings[token].items():
+                    token_scores[doc_id] = max(token_scores.get(doc_id, 0.0), match_score * weight)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: score + token_scores[doc_id] for doc_id, score in scores.items() if doc_id in token_scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{**self.rows[doc_id], "rank": round(score, 4)} for doc_id, score in ranked]
+
+
+product_index = InMemorySearchIndex(
+    Product, {"name": 1.0, "category": 0.6, "description": 0.3},
+    ["id", "name", "category", "price", "current_stock", "image_url"],
+)
+contact_index = InMemorySearchIndex(
+    Contact, {"name": 1.0, "email": 0.6, "phone": 0.6},
+    ["id", "name", "email", "phone", "contact_type"],
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_indexes_dirty(session, flush_context):
+    """Any ORM write to products or contacts invalidates the in-memory indexes."""
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Product):
+            product_index.dirty = True
+        elif isinstance(instance, Contact):
+            contact_index.dirty = True
+
+
+# ============= ENDPOINTS =============
+
+def query_tokens(q: str) -> List[str]:
+    tokens = tokenize(q)[:MAX_QUERY_TOKENS]
+    if not tokens:
+        raise HTTPException(status_code=400, detail="Search query must contain letters or digits")
+    return tokens
+
+
+@router.get("/products")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session),
+):
+    """Ranked product search by name, category and description. Matches prefixes and near-misses."""
+    tokens = query_tokens(q)
+    if engine.dialect.name == "postgresql":
+        return await _postgres_search(session, "product", PRODUCT_COLUMNS, PRODUCT_DOCUMENT,
+                                      PRODUCT_TRIGRAM, q, tokens, limit)
+    await product_index.ensure_built(session)
+    return product_index.search(tokens, limit)
+
+
+@admin_router.get("/contacts")
+async def search_contacts(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session),
+):
+    """Ranked contact search by name, email and phone."""
+    tokens = query_tokens(q)
+    if engine.dialect.name == "postgresql":
+        return await _postgres_search(session, "contact", CONTACT_COLUMNS, CONTACT_DOCUMENT,
+                                      CONTACT_TRIGRAM, q, tokens, limit)
+    await contact_index.ensure_built(session)
+    return contact_index.search(tokens, limit)
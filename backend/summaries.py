@@ -0,0 +1,151 @@
+"""
+Summary projections for admin document lists
+List screens only show header columns, so these endpoints select exactly those
+columns plus the counterparty name and a line count (a correlated COUNT on the
+indexed line foreign key) in one query. Rows are never turned into ORM objects
+or validated by a response model: they are dumped straight to JSON.
+
+Filters, sorting and keyset pagination (X-Next-Cursor) come from the same
+DocumentList definitions as the full list endpoints in admin_api.py; lines stay
+on the detail endpoints.
+"""
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from admin_api import INVOICE_LIST, PURCHASE_ORDER_LIST, SALE_ORDER_LIST, VENDOR_BILL_LIST
+from db import get_session
+from models import (
+    Contact, SaleOrder, SaleOrderLine, OrderStatus,
+    Invoice, InvoiceLine, InvoiceStatus,
+    PurchaseOrder, PurchaseOrderLine,
+    VendorBill, VendorBillLine
+)
+from pagination import NEXT_CURSOR_HEADER, PageParams, paginate
+
+router = APIRouter(prefix="/admin/summaries", tags=["admin"])
+
+
+def _json_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def json_rows(rows, response: Response) -> Response:
+    """Plain JSON array; carries over the pagination header set on the injected response."""
+    headers = {}
+    if NEXT_CURSOR_HEADER in response.headers:
+        headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    body = json.dumps(rows, default=_json_default, separators=(",", ":"))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def line_count(line_model, foreign_key, document_id):
+    return (
+        select(func.count(line_model.id))
+        .where(foreign_key == document_id)
+        .correlate_except(line_model)
+        .scalar_subquery()
+        .label("line_count")
+    )
+
+
+@router.get("/sales-orders")
+async def sales_order_summaries(
+    response: Response,
+    status: Optional[OrderStatus] = None,
+    customer_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    """Sales order headers with customer name and line count"""
+    query = select(
+        SaleOrder.id, SaleOrder.order_number, SaleOrder.customer_id, Contact.name.label("customer_name"),
+        SaleOrder.order_date, SaleOrder.delivery_date, SaleOrder.status,
+        SaleOrder.total_amount, SaleOrder.tax_amount, SaleOrder.discount_amount, SaleOrder.created_at,
+        line_count(SaleOrderLine, SaleOrderLine.order_id, SaleOrder.id),
+    ).join(Contact, Contact.id == SaleOrder.customer_id)
+    query = SALE_ORDER_LIST.filter(query, status, customer_id, date_from, date_to)
+    rows = await paginate(session, query, response, page, SALE_ORDER_LIST.sort_fields, as_rows=True)
+    return json_rows(rows, response)
+
+
+@router.get("/invoices")
+async def invoice_summaries(
+    response: Response,
+    status: Optional[InvoiceStatus] = None,
+    customer_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    """Invoice headers with customer name, balance due and line count"""
+    query = select(
+        Invoice.id, Invoice.invoice_number, Invoice.sale_order_id,
+        Invoice.customer_id, Contact.name.label("customer_name"),
+        Invoice.invoice_date, Invoice.due_date, Invoice.status,
+        Invoice.total_amount, Invoice.tax_amount, Invoice.amount_paid,
+        (Invoice.total_amount - Invoice.amount_paid).label("balance_due"), Invoice.created_at,
+        line_count(InvoiceLine, InvoiceLine.invoice_id, Invoice.id),
+    ).join(Contact, Contact.id == Invoice.customer_id)
+    query = INVOICE_LIST.filter(query, status, customer_id, date_from, date_to)
+    rows = await paginate(session, query, response, page, INVOICE_LIST.sort_fields, as_rows=True)
+    return json_rows(rows, response)
+
+
+@router.get("/purchase-orders")
+async def purchase_order_summaries(
+    response: Response,
+    status: Optional[OrderStatus] = None,
+    vendor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    """Purchase order headers with vendor name and line count"""
+    query = select(
+        PurchaseOrder.id, PurchaseOrder.order_number, PurchaseOrder.vendor_id, Contact.name.label("vendor_name"),
+        PurchaseOrder.order_date, PurchaseOrder.expected_delivery, PurchaseOrder.status,
+        PurchaseOrder.total_amount, PurchaseOrder.tax_amount, PurchaseOrder.created_at,
+        line_count(PurchaseOrderLine, PurchaseOrderLine.purchase_order_id, PurchaseOrder.id),
+    ).join(Contact, Contact.id == PurchaseOrder.vendor_id)
+    query = PURCHASE_ORDER_LIST.filter(query, status, vendor_id, date_from, date_to)
+    rows = await paginate(session, query, response, page, PURCHASE_ORDER_LIST.sort_fields, as_rows=True)
+    return json_rows(rows, response)
+
+
+@router.get("/vendor-bills")
+async def vendor_bill_summaries(
+    response: Response,
+    status: Optional[InvoiceStatus] = None,
+    vendor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    """Vendor bill headers with vendor name, balance due and line count"""
+    query = select(
+        VendorBill.id, VendorBill.bill_number, VendorBill.purchase_order_id,
+        VendorBill.vendor_id, Contact.name.label("vendor_name"),
+        VendorBill.bill_date, VendorBill.due_date, VendorBill.status,
+        VendorBill.total_amount, VendorBill.tax_amount, VendorBill.amount_paid,
+        (VendorBill.total_amount - VendorBill.amount_paid).label("balance_due"), VendorBill.created_at,
+        line_count(VendorBillLine, VendorBillLine.bill_id, VendorBill.id),
+    ).join(Contact, Contact.id == VendorBill.vendor_id)
+    query = VENDOR_BILL_LIST.filter(query, status, vendor_id, date_from, date_to)
+    rows = await paginate(session, query, response, page, VENDOR_BILL_LIST.sort_fields, as_rows=True)
+    return json_rows(rows, response)
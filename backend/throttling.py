@@ -0,0 +1,155 @@
+"""
+Login throttling
+Token buckets keyed by client IP and by account name, checked before any bcrypt
+work so credential stuffing cannot burn the worker's CPU.
+
+Each attempt takes one token from the IP bucket and one from the account bucket.
+Buckets refill continuously at *_PER_MINUTE and hold at most *_BURST tokens; an
+empty bucket answers 429 with Retry-After.
+
+Backends:
+- memory: per-worker buckets (default)
+- redis:  shared across workers/instances via REDIS_URL; needs the `redis`
+          package. Redis errors fail open so an outage never blocks logins.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+LOGIN_THROTTLE_ENABLED = os.getenv("LOGIN_THROTTLE_ENABLED", "true").lower() == "true"
+LOGIN_THROTTLE_BACKEND = os.getenv("LOGIN_THROTTLE_BACKEND", "memory").lower()
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", "20"))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", "10"))
+LOGIN_ACCOUNT_BURST = int(os.getenv("LOGIN_ACCOUNT_BURST", "5"))
+LOGIN_ACCOUNT_PER_MINUTE = float(os.getenv("LOGIN_ACCOUNT_PER_MINUTE", "5"))
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryBucketStore:
+    """Buckets in an LRU dict capped at LOGIN_THROTTLE_MAX_KEYS entries."""
+
+    def __init__(self, max_keys: int = LOGIN_THROTTLE_MAX_KEYS):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, burst: int, per_second: float) -> float:
+        """Take one token. Returns 0 when allowed, otherwise seconds until a token is available."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * per_second)
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return 0.0
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        return (1 - tokens) / per_second if per_second > 0 else 60.0
+
+
+# KEYS[1] bucket key; ARGV: burst, tokens per second, now (seconds)
+# Returns 0 when allowed, otherwise milliseconds to wait
+REDIS_TAKE_SCRIPT = """
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return wait
+"""
+
+
+class RedisBucketStore:
+    """Shared buckets, updated atomically by a Lua script."""
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(REDIS_TAKE_SCRIPT)
+
+    async def take(self, key: str, burst: int, per_second: float) -> float:
+        wait_ms = await self.script(keys=[f"login_throttle:{key}"], args=[burst, per_second, time.time()])
+        return int(wait_ms) / 1000
+
+
+class LoginThrottle:
+    def __init__(self, backend: str = LOGIN_THROTTLE_BACKEND):
+        self.backend = backend
+        self._store = None
+        self.allowed = 0
+        self.throttled_ip = 0
+        self.throttled_account = 0
+        self.store_errors = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            if self.backend == "redis":
+                self._store = RedisBucketStore()
+            elif self.backend == "memory":
+                self._store = MemoryBucketStore()
+            else:
+                raise ValueError(f"Unknown LOGIN_THROTTLE_BACKEND: {self.backend}")
+        return self._store
+
+    async def _take(self, key: str, burst: int, per_minute: float) -> float:
+        try:
+            return await self.store.take(key, burst, per_minute / 60)
+        except Exception as e:
+            self.store_errors += 1
+            print(f"⚠️ Login throttle store error, allowing attempt: {e}")
+            return 0.0
+
+    async def check(self, request: Request, account: Optional[str]):
+        """Raise 429 if this IP or account is out of login attempts. Call before verifying the password."""
+        if not LOGIN_THROTTLE_ENABLED:
+            return
+        ip = request.client.host if request.client else "unknown"
+        wait = await self._take(f"ip:{ip}", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE)
+        if wait:
+            self.throttled_ip += 1
+            self._reject(wait)
+        if account:
+            wait = await self._take(f"account:{account.strip().lower()}", LOGIN_ACCOUNT_BURST, LOGIN_ACCOUNT_PER_MINUTE)
+            if wait:
+                self.throttled_account += 1
+                self._reject(wait)
+        self.allowed += 1
+
+    def _reject(self, wait: float):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": LOGIN_THROTTLE_ENABLED,
+            "backend": self.backend,
+            "allowed": self.allowed,
+            "throttled_ip": self.throttled_ip,
+            "throttled_account": self.throttled_account,
+            "store_errors": self.store_errors,
+        }
+
+
+# Global instance
+login_throttle = LoginThrottle()
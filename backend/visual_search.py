@@ -1,17 +1,24 @@
 """
 Visual Search API using CLIP model
 Allows users to upload an image and find similar products
+
+torch, transformers and Pillow are only imported on the first search request,
+so API-only workers never pay for the ML stack. Set VISUAL_SEARCH_ENABLED=false
+to leave the routes unmounted entirely.
 """
 import os
-import torch
-from PIL import Image
 from io import BytesIO
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from pydantic import BaseModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
+if TYPE_CHECKING:
+    from PIL import Image
+
+VISUAL_SEARCH_ENABLED = os.getenv("VISUAL_SEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
 # Lazy load heavy dependencies
 _model = None
 _processor = None
@@ -41,8 +48,9 @@ class VisualSearchResponse(BaseModel):
     results: List[VisualSearchResult]
     query_processed: bool
 
-def get_image_embedding(image: Image.Image):
+def get_image_embedding(image: "Image.Image"):
     """Converts an image into a mathematical vector (embedding)"""
+    import torch
     model, processor = get_clip_model()
     image = image.convert("RGB")
     inputs = processor(images=image, return_tensors="pt")
@@ -53,6 +61,7 @@ def get_image_embedding(image: Image.Image):
 
 def get_text_embedding(text: str):
     """Converts text description into embedding for comparison"""
+    import torch
     model, processor = get_clip_model()
     inputs = processor(text=[text], return_tensors="pt", padding=True)
     with torch.no_grad():
@@ -76,6 +85,10 @@ async def get_product_embedding(product_name: str, product_category: str = ""):
         _product_embeddings_cache[cache_key] = get_text_embedding(description)
     return _product_embeddings_cache[cache_key]
 
+def invalidate_product_embeddings():
+    """Drop cached product embeddings after bulk catalog changes; they are recomputed lazily."""
+    _product_embeddings_cache.clear()
+
 @router.post("/search", response_model=VisualSearchResponse)
 async def visual_search(
     image: UploadFile = File(...),
@@ -86,6 +99,8 @@ async def visual_search(
     Uses CLIP model to compare the uploaded image against product descriptions.
     """
     try:
+        from PIL import Image
+
         # Read and process the uploaded image
         contents = await image.read()
         pil_image = Image.open(BytesIO(contents))
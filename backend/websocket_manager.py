@@ -1,36 +1,778 @@
 from fastapi import WebSocket
-from typing import List
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from collections import OrderedDict, deque
+import asyncio
+import itertools
 import json
+import os
+import time
+import uuid
 from datetime import datetime # FIX: Add missing import
 
-class ConnectionManager:
+from event_bus import EventBus, InMemoryEventBus, NOTIFY_PAYLOAD_LIMIT
+from stock_alerts import DEFAULT_LOW_STOCK_THRESHOLD
+
+# All real-time events travel on one bus channel; the "type" field tells them apart
+EVENTS_CHANNEL = "appareldesk_events"
+
+# --- Per-client send queue settings ---
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+# Consecutive timed-out sends before a client is considered dead and dropped
+WS_MAX_SLOW_STRIKES = int(os.getenv("WS_MAX_SLOW_STRIKES", "3"))
+# "coalesce": a newer frame with the same key (e.g. one product) replaces the queued one;
+# "drop_oldest": every message is queued and the oldest is dropped when full
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "coalesce").lower()
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+
+# --- Stock event batching ---
+# Stock changes are collected for this long and published as one STOCK_BATCH
+# holding only the latest level per product
+STOCK_BATCH_WINDOW_MS = float(os.getenv("STOCK_BATCH_WINDOW_MS", "100"))
+# Batches are split so each one stays inside the Postgres NOTIFY payload limit
+STOCK_BATCH_MAX_BYTES = NOTIFY_PAYLOAD_LIMIT - 256
+
+# --- Topics ---
+# Clients start on the firehose ("all") and can narrow down to:
+#   product:<id>, category:<name>, orders, low_stock
+TOPIC_ALL = "all"
+TOPIC_ORDERS = "orders"
+TOPIC_LOW_STOCK = "low_stock"
+TOPIC_PREFIXES = ("product:", "category:")
+MAX_TOPICS_PER_CLIENT = int(os.getenv("WS_MAX_TOPICS_PER_CLIENT", "500"))
+
+# --- Heartbeats ---
+# The server pings every interval; clients answer {"action": "pong"} (any message
+# counts). Sockets silent for longer than the idle timeout are reaped, which
+# catches half-open TCP connections that never raise on receive.
+WS_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "25"))
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "75"))
+
+# --- Resync ---
+# Recent events kept per worker so reconnecting clients can catch up with deltas
+WS_REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "1000"))
+
+# --- Public storefront stock channel ---
+PUBLIC_WS_MAX_PRODUCTS = int(os.getenv("PUBLIC_WS_MAX_PRODUCTS", "100"))
+PUBLIC_WS_QUEUE_SIZE = int(os.getenv("PUBLIC_WS_QUEUE_SIZE", "32"))
+# Latest known stock per product, sent to a client as soon as it starts watching
+PUBLIC_STOCK_CACHE_SIZE = int(os.getenv("PUBLIC_STOCK_CACHE_SIZE", "100000"))
+
+# Non-stock event types and the topic they are published under
+EVENT_TOPICS = {
+    "ORDER_CREATED": TOPIC_ORDERS,
+}
+
+
+def is_valid_topic(topic: str) -> bool:
+    if topic in (TOPIC_ALL, TOPIC_ORDERS, TOPIC_LOW_STOCK):
+        return True
+    if topic.startswith("product:"):
+        return topic[len("product:"):].isdigit()
+    return topic.startswith("category:") and len(topic) > len("category:")
+
+
+def coalesce_stock_batches(older: dict, newer: dict) -> dict:
+    """
+    One STOCK_BATCH holding the latest update per product of both. It carries the
+    newer seq and the older `first_seq`, so clients see that no event is missing.
+    """
+    updates = {update["product_id"]: update for update in older["updates"]}
+    for update in newer["updates"]:
+        previous = updates.get(update["product_id"])
+        merged = dict(update)
+        if previous is not None:
+            # A threshold crossing in the older update still holds if the newer level agrees
+            if previous.get("low_stock") and merged["new_stock"] <= DEFAULT_LOW_STOCK_THRESHOLD:
+                merged["low_stock"] = True
+            if previous.get("restocked") and merged["new_stock"] > DEFAULT_LOW_STOCK_THRESHOLD:
+                merged["restocked"] = True
+            del updates[update["product_id"]]
+        updates[update["product_id"]] = merged
+    return {
+        **newer,
+        "first_seq": older.get("first_seq", older["seq"]),
+        "updates": list(updates.values()),
+    }
+
+
+def stock_update_topics(update: dict) -> List[str]:
+    topics = [f"product:{update['product_id']}"]
+    if update.get("category"):
+        topics.append(f"category:{update['category']}")
+    if update.get("low_stock") or update.get("restocked"):
+        topics.append(TOPIC_LOW_STOCK)
+    return topics
+
+
+class BroadcastMetrics:
+    """Counters for the websocket fan-out, exposed via /api/metrics."""
+
+    def __init__(self, sample_size: int = 1024):
+        self.messages_published = 0
+        self.frames_enqueued = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.frames_coalesced = 0
+        self.failed_sends = 0
+        self.slow_disconnects = 0
+        self.reaped_idle = 0
+        self.resumes_replayed = 0
+        self.resumes_snapshot = 0
+        self._latencies = deque(maxlen=sample_size)
+        self._latency_max = 0.0
+
+    def record_send(self, seconds: float):
+        self.frames_sent += 1
+        self._latencies.append(seconds)
+        self._latency_max = max(self._latency_max, seconds)
+
+    def latency_summary(self) -> dict:
+        samples = sorted(self._latencies)
+        if not samples:
+            return {"samples": 0, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "samples": len(samples),
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+            "max_ms": round(self._latency_max * 1000, 3),
+        }
+
+
+class ClientConnection:
+    """
+    One websocket plus its bounded outgoing queue and sender task.
+    Broadcasting only enqueues, so a slow client never blocks the others.
+    """
+
+    _unique_keys = itertools.count()
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager",
+                 max_queue: int = WS_QUEUE_SIZE, policy: str = WS_OVERFLOW_POLICY,
+                 send_timeout: float = WS_SEND_TIMEOUT_SECONDS, max_strikes: int = WS_MAX_SLOW_STRIKES):
+        self.websocket = websocket
+        self.manager = manager
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.max_strikes = max_strikes
+        # Keyed queue: coalescable frames share a key, everything else gets a unique one
+        self.queue: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.slow_strikes = 0
+        self.closed = False
+        self.last_seen = time.monotonic()
+        # Admin topic names, or watched product ids on the public channel
+        self.topics: Set[Hashable] = set()
+        # Highest event seq queued to this client; older or repeated events are skipped
+        self.last_seq = 0
+        # While a resume catches the client up, live events wait here instead of jumping the queue
+        self.held: Optional[List[Tuple[int, str, Optional[dict]]]] = None
+        # Queue key and payload of the STOCK_BATCH at the tail of the queue, if any
+        self._tail_batch: Optional[Tuple[Hashable, dict]] = None
+        self._ready = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._sender = asyncio.create_task(self._run())
+
+    def enqueue(self, frame: str, key: Optional[Hashable] = None):
+        if self.closed:
+            return
+        metrics = self.manager.stats
+        if key is not None and self.policy == OVERFLOW_COALESCE and key in self.queue:
+            self.queue[key] = frame
+            metrics.frames_coalesced += 1
+            return
+        if len(self.queue) >= self.max_queue:
+            self.queue.popitem(last=False)
+            metrics.frames_dropped += 1
+        if key is None or self.policy != OVERFLOW_COALESCE:
+            key = ("_", next(self._unique_keys))
+        self.queue[key] = frame
+        metrics.frames_enqueued += 1
+        self._ready.set()
+
+    def send_event(self, seq: int, frame: str, batch: Optional[dict] = None):
+        """
+        Queue a numbered event unless the client already has it. `batch` is the
+        STOCK_BATCH payload behind `frame`: under the coalesce policy it is merged
+        into a batch still waiting at the tail of the queue, latest stock per product.
+        """
+        if seq <= self.last_seq or self.closed:
+            return
+        self.last_seq = seq
+        if batch is None or self.policy != OVERFLOW_COALESCE:
+            self.enqueue(frame)
+            return
+        tail = self._tail_batch
+        # Only the tail can absorb it: merging past a queued event would reorder seqs
+        if tail is not None and self.queue and next(reversed(self.queue)) == tail[0]:
+            key, pending = tail
+            merged = coalesce_stock_batches(pending, batch)
+            self.queue[key] = json.dumps(merged)
+            self._tail_batch = (key, merged)
+            self.manager.stats.frames_coalesced += 1
+            return
+        key = ("stock", seq)
+        self.enqueue(frame, key)
+        self._tail_batch = (key, batch)
+
+    def deliver(self, seq: int, frame: str, batch: Optional[dict] = None):
+        """Live delivery: held back while a resume is in progress."""
+        if self.held is not None:
+            self.held.append((seq, frame, batch))
+        else:
+            self.send_event(seq, frame, batch)
+
+    def release(self):
+        """End a resume: send the live events that arrived meanwhile, minus any already replayed."""
+        held, self.held = self.held or [], None
+        for seq, frame, batch in held:
+            self.send_event(seq, frame, batch)
+
+    async def _run(self):
+        metrics = self.manager.stats
+        while not self.closed:
+            await self._ready.wait()
+            self._ready.clear()
+            while self.queue and not self.closed:
+                _, frame = self.queue.popitem(last=False)
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+                except asyncio.TimeoutError:
+                    self.slow_strikes += 1
+                    if self.slow_strikes >= self.max_strikes:
+                        metrics.slow_disconnects += 1
+                        await self.manager.drop(self.websocket, code=1013)
+                        return
+                    continue
+                except Exception:
+                    metrics.failed_sends += 1
+                    await self.manager.drop(self.websocket)
+                    return
+                self.slow_strikes = 0
+                metrics.record_send(time.perf_counter() - started)
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        if self._sender is not None and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+
+
+class PublicStockChannel:
+    """
+    Read-only stock feed for storefront shoppers (/ws/stock).
+
+    Clients watch the product ids on their page. Each product update is encoded
+    once and queued for that product's watchers only; per-client queues are
+    small and coalesce by product, so memory per client is bounded by
+    min(PUBLIC_WS_QUEUE_SIZE, PUBLIC_WS_MAX_PRODUCTS) frames.
+    """
+
     def __init__(self):
-        # We store list of active admin sockets
-        self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        # product_id -> watching clients
+        self.watchers: Dict[int, Set[ClientConnection]] = {}
+        self.latest_stock: "OrderedDict[int, int]" = OrderedDict()
+        self.stats = BroadcastMetrics()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(websocket, self, max_queue=PUBLIC_WS_QUEUE_SIZE, policy=OVERFLOW_COALESCE)
+        self.clients[websocket] = client
+        client.start()
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            self._unwatch(client, list(client.topics))
+            client.close()
+
+    async def drop(self, websocket: WebSocket, code: int = 1011):
+        self.disconnect(websocket)
+        try:
+            await asyncio.wait_for(websocket.close(code=code), WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+    async def handle_message(self, websocket: WebSocket, message: str):
+        """
+        {"action": "watch", "product_ids": [1, 2, 3]}   replaces the watch list
+        {"action": "unwatch", "product_ids": [2]}
+        {"action": "pong"}
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        client.last_seen = time.monotonic()
+        try:
+            data = json.loads(message)
+            action = data.get("action")
+            product_ids = data.get("product_ids", [])
+            if not isinstance(product_ids, list) or not all(isinstance(p, int) for p in product_ids):
+                raise ValueError("product_ids must be a list of integers")
+            if action == "watch":
+                if len(set(product_ids)) > PUBLIC_WS_MAX_PRODUCTS:
+                    raise ValueError(f"Too many products (max {PUBLIC_WS_MAX_PRODUCTS})")
+                self._unwatch(client, [p for p in client.topics if p not in product_ids])
+                self._watch(client, product_ids)
+            elif action == "unwatch":
+                self._unwatch(client, product_ids)
+            else:
+                return
+        except (ValueError, AttributeError) as e:
+            client.enqueue(json.dumps({"type": "ERROR", "detail": str(e)}))
+            return
+        client.enqueue(json.dumps({"type": "WATCHING", "product_ids": sorted(client.topics)}))
+
+    def _watch(self, client: ClientConnection, product_ids: Iterable[int]):
+        for product_id in product_ids:
+            if product_id in client.topics:
+                continue
+            client.topics.add(product_id)
+            self.watchers.setdefault(product_id, set()).add(client)
+            if product_id in self.latest_stock:
+                client.enqueue(self._frame(product_id, self.latest_stock[product_id]), key=product_id)
+
+    def _unwatch(self, client: ClientConnection, product_ids: Iterable[int]):
+        for product_id in product_ids:
+            client.topics.discard(product_id)
+            watchers = self.watchers.get(product_id)
+            if watchers is not None:
+                watchers.discard(client)
+                if not watchers:
+                    del self.watchers[product_id]
+
+    @staticmethod
+    def _frame(product_id: int, stock: int) -> str:
+        return json.dumps({"type": "STOCK", "product_id": product_id, "stock": stock})
+
+    def on_stock_batch(self, payload: dict):
+        for update in payload["updates"]:
+            product_id, stock = update["product_id"], update["new_stock"]
+            self.latest_stock[product_id] = stock
+            self.latest_stock.move_to_end(product_id)
+            if len(self.latest_stock) > PUBLIC_STOCK_CACHE_SIZE:
+                self.latest_stock.popitem(last=False)
+
+            watchers = self.watchers.get(product_id)
+            if not watchers:
+                continue
+            # One frame per product update regardless of how many shoppers watch it
+            frame = self._frame(product_id, stock)
+            self.stats.messages_published += 1
+            for client in watchers:
+                client.enqueue(frame, key=product_id)
+
+    def metrics(self) -> dict:
+        depths = [len(client.queue) for client in self.clients.values()]
+        return {
+            "connections": len(self.clients),
+            "watched_products": len(self.watchers),
+            "queue_depth": {"total": sum(depths), "max": max(depths, default=0), "capacity": PUBLIC_WS_QUEUE_SIZE},
+            "frames_sent": self.stats.frames_sent,
+            "frames_dropped": self.stats.frames_dropped,
+            "frames_coalesced": self.stats.frames_coalesced,
+            "slow_disconnects": self.stats.slow_disconnects,
+            "reaped_idle": self.stats.reaped_idle,
+            "send_latency": self.stats.latency_summary(),
+        }
+
+
+class ConnectionManager:
+    def __init__(self, bus: Optional[EventBus] = None):
+        # Active admin sockets, keyed by websocket for O(1) connect/disconnect
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # topic -> subscribed clients, so an event only touches its own subscribers
+        self.topics: Dict[str, Set[ClientConnection]] = {}
+        self.stats = BroadcastMetrics()
+        # Storefront feed, fed from the same stock events
+        self.public = PublicStockChannel()
+        # Events are published on the bus and delivered back to every worker
+        # (including this one), which then fans them out to its own sockets
+        self.bus = bus or InMemoryEventBus()
+        self.bus.subscribe(EVENTS_CHANNEL, self._on_event)
+        # product_id -> latest stock update, waiting for the current batch window to close
+        self._pending_stock: Dict[int, dict] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # Every delivered event gets the next sequence number. Numbers are only
+        # meaningful within one epoch (this worker's lifetime); a client resuming
+        # against another epoch gets a snapshot instead of deltas.
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.history: deque = deque(maxlen=WS_REPLAY_BUFFER_SIZE)  # (seq, payload, frame)
+
+    async def start(self, bus: Optional[EventBus] = None):
+        """Swap in the configured bus (e.g. Postgres) and start listening."""
+        if bus is not None:
+            self.bus = bus
+            self.bus.subscribe(EVENTS_CHANNEL, self._on_event)
+        await self.bus.start()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_forever())
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush_stock_updates()
+        await self.bus.stop()
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
+        for websocket in list(self.public.clients):
+            self.public.disconnect(websocket)
+
+    async def _heartbeat_forever(self):
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"❌ Websocket heartbeat error: {e}")
+
+    async def heartbeat(self):
+        """Reap sockets that have gone quiet and ping the rest."""
+        now = time.monotonic()
+        ping = json.dumps({"type": "PING", "ts": time.time()})
+        for channel, clients in ((self, self.active_connections), (self.public, self.public.clients)):
+            for websocket, client in list(clients.items()):
+                if now - client.last_seen > WS_IDLE_TIMEOUT_SECONDS:
+                    channel.stats.reaped_idle += 1
+                    await channel.drop(websocket, code=1001)
+                else:
+                    client.enqueue(ping)
+
+    async def connect(self, websocket: WebSocket, epoch: Optional[str] = None, last_seq: Optional[int] = None):
+        """
+        Register an admin socket. A reconnecting client should pass the epoch and
+        last_seq it saw (query parameters on /ws/admin): the catch-up is then queued
+        before any live event, so nothing arrives twice or out of order.
+        """
+        await websocket.accept()
+        client = ClientConnection(websocket, self)
+        self.active_connections[websocket] = client
+        self.subscribe(client, [TOPIC_ALL])
+        client.enqueue(json.dumps({"type": "HELLO", "epoch": self.epoch, "seq": self.seq}))
+        client.start()
+        if epoch is not None and last_seq is not None:
+            await self.resume(client, epoch, last_seq)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is not None:
+            self.unsubscribe(client, list(client.topics))
+            client.close()
+
+    def subscribe(self, client: ClientConnection, topics: Iterable[str]):
+        for topic in topics:
+            if topic in client.topics:
+                continue
+            if len(client.topics) >= MAX_TOPICS_PER_CLIENT:
+                raise ValueError(f"Too many topics (max {MAX_TOPICS_PER_CLIENT})")
+            client.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(client)
+
+    def unsubscribe(self, client: ClientConnection, topics: Iterable[str]):
+        for topic in topics:
+            client.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.topics[topic]
+
+    async def handle_message(self, websocket: WebSocket, message: str):
+        """
+        Client -> server control messages:
+            {"action": "subscribe", "topics": ["product:12", "category:Ethnic Wear"]}
+            {"action": "unsubscribe", "topics": ["all"]}
+            {"action": "resume", "epoch": "<from HELLO>", "last_seq": 41}
+            {"action": "pong"}                              reply to PING, only refreshes last_seen
+        """
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        client.last_seen = time.monotonic()
+        try:
+            data = json.loads(message)
+            action = data.get("action")
+            if action == "resume":
+                await self.resume(client, data.get("epoch"), int(data.get("last_seq", 0)))
+                return
+            topics = data.get("topics", [])
+            if not isinstance(topics, list) or not all(isinstance(t, str) for t in topics):
+                raise ValueError("topics must be a list of strings")
+            if action == "subscribe":
+                invalid = [t for t in topics if not is_valid_topic(t)]
+                if invalid:
+                    raise ValueError(f"Unknown topics: {', '.join(invalid)}")
+                self.subscribe(client, topics)
+            elif action == "unsubscribe":
+                self.unsubscribe(client, topics)
+            else:
+                # Anything else (e.g. keep-alive text) is ignored
+                return
+        except (ValueError, TypeError, AttributeError) as e:
+            client.enqueue(json.dumps({"type": "ERROR", "detail": str(e)}))
+            return
+        client.enqueue(json.dumps({"type": "SUBSCRIBED", "topics": sorted(client.topics)}))
 
-    async def broadcast_stock_update(self, product_id: int, new_stock: int):
+    async def resume(self, client: ClientConnection, epoch: Optional[str], last_seq: int):
+        """
+        Catch a reconnecting client up: replay the missed events from the ring
+        buffer when possible, otherwise send a compact stock snapshot. Live events
+        are held until the catch-up is queued, then sent without duplicates.
+        """
+        client.held = client.held if client.held is not None else []
+        try:
+            oldest_seq = self.history[0][0] if self.history else self.seq + 1
+            # Replaying is only safe if no newer event already went out live;
+            # otherwise the missed deltas would land after newer stock levels
+            if epoch == self.epoch and oldest_seq - 1 <= last_seq <= self.seq and client.last_seq <= last_seq:
+                replayed = self._replay(client, last_seq)
+                self.stats.resumes_replayed += 1
+                client.enqueue(json.dumps({
+                    "type": "RESUMED", "epoch": self.epoch, "from_seq": last_seq, "to_seq": self.seq, "count": replayed,
+                }))
+                return
+
+            # Too far behind (or a different worker/epoch): snapshot, then replay
+            # whatever was delivered while the snapshot query ran
+            snapshot_seq = self.seq
+            stock = await self._stock_snapshot(client)
+            self.stats.resumes_snapshot += 1
+            client.enqueue(json.dumps({
+                "type": "SNAPSHOT", "epoch": self.epoch, "seq": snapshot_seq, "stock": stock,
+            }))
+            self._replay(client, snapshot_seq)
+        finally:
+            client.release()
+
+    def _replay(self, client: ClientConnection, after_seq: int) -> int:
+        count = 0
+        for seq, payload, frame in self.history:
+            if seq <= after_seq or seq <= client.last_seq:
+                continue
+            frame = self._frame_for(client, payload, frame)
+            if frame is not None:
+                client.send_event(seq, frame)
+                count += 1
+        return count
+
+    def _frame_for(self, client: ClientConnection, payload: dict, frame: str) -> Optional[str]:
+        """The frame `client` should get for a historical event, filtered by its topics."""
+        if TOPIC_ALL in client.topics:
+            return frame
+        if payload.get("type") == "STOCK_BATCH":
+            updates = [u for u in payload["updates"] if client.topics.intersection(stock_update_topics(u))]
+            return json.dumps({**payload, "updates": updates}) if updates else None
+        return frame if EVENT_TOPICS.get(payload.get("type")) in client.topics else None
+
+    async def _stock_snapshot(self, client: ClientConnection) -> List[list]:
+        """[[product_id, current_stock], ...] for the products the client follows."""
+        from sqlmodel import select, or_
+        from sqlmodel.ext.asyncio.session import AsyncSession
+        from db import engine
+        from models import Product
+
+        query = select(Product.id, Product.current_stock)
+        if TOPIC_ALL not in client.topics:
+            product_ids = [int(t.split(":", 1)[1]) for t in client.topics if t.startswith("product:")]
+            categories = [t.split(":", 1)[1] for t in client.topics if t.startswith("category:")]
+            if not product_ids and not categories:
+                return []
+            query = query.where(or_(Product.id.in_(product_ids), Product.category.in_(categories)))
+        async with AsyncSession(engine) as session:
+            result = await session.execute(query.order_by(Product.id))
+            return [[product_id, stock] for product_id, stock in result.all()]
+
+    async def drop(self, websocket: WebSocket, code: int = 1011):
+        """Forcefully remove a dead or persistently slow client."""
+        self.disconnect(websocket)
+        try:
+            await asyncio.wait_for(websocket.close(code=code), WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            # The socket is already gone; nothing left to clean up
+            pass
+
+    async def publish(self, payload: dict):
+        # Callers publish after their transaction has committed, so a bus
+        # failure must not turn a successful write into an error response
+        try:
+            await self.bus.publish(EVENTS_CHANNEL, payload)
+        except Exception as e:
+            print(f"❌ Failed to publish {payload.get('type')} event: {e}")
+
+    async def broadcast_stock_update(self, product_id: int, new_stock: int,
+                                     category: Optional[str] = None, previous_stock: Optional[int] = None):
         """
         Push state change to Electron Admin App.
         Frontend should listen to this and update React Context immediately.
+        Updates are coalesced per product and sent as a STOCK_BATCH once the
+        batch window closes. Pass previous_stock so low-stock crossings can be flagged.
         """
-        payload = {
-            "type": "STOCK_UPDATE",
+        self._queue_stock_update(product_id, new_stock, category, previous_stock)
+        self._schedule_flush()
+
+    async def broadcast_stock_updates(self, updates: Iterable[dict]):
+        """Queue many {product_id, new_stock, category?, previous_stock?} changes for the next STOCK_BATCH."""
+        for update in updates:
+            self._queue_stock_update(
+                update["product_id"], update["new_stock"],
+                update.get("category"), update.get("previous_stock"),
+            )
+        self._schedule_flush()
+
+    def _queue_stock_update(self, product_id: int, new_stock: int,
+                            category: Optional[str], previous_stock: Optional[int]):
+        pending = self._pending_stock.get(product_id)
+        if pending is not None:
+            # Keep the stock level from before the window opened to detect crossings
+            previous_stock = pending["previous_stock"]
+            category = category or pending["category"]
+        self._pending_stock[product_id] = {
             "product_id": product_id,
             "new_stock": new_stock,
+            "category": category,
+            "previous_stock": previous_stock,
+        }
+
+    def _schedule_flush(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(STOCK_BATCH_WINDOW_MS / 1000)
+        # Updates arriving while this batch is published open the next window
+        self._flush_task = None
+        await self.flush_stock_updates()
+
+    async def flush_stock_updates(self):
+        """Publish everything pending now, split into NOTIFY-sized batches."""
+        pending, self._pending_stock = self._pending_stock, {}
+        batch: List[dict] = []
+        batch_bytes = 0
+        for item in pending.values():
+            update = {"product_id": item["product_id"], "new_stock": item["new_stock"]}
+            if item["category"]:
+                update["category"] = item["category"]
+            previous = item["previous_stock"]
+            if previous is not None and previous > DEFAULT_LOW_STOCK_THRESHOLD >= item["new_stock"]:
+                update["low_stock"] = True
+            elif previous is not None and previous <= DEFAULT_LOW_STOCK_THRESHOLD < item["new_stock"]:
+                # Back above the threshold: low_stock watchers can clear the alert
+                update["restocked"] = True
+            size = len(json.dumps(update)) + 2
+            if batch and batch_bytes + size > STOCK_BATCH_MAX_BYTES:
+                await self._publish_stock_batch(batch)
+                batch, batch_bytes = [], 0
+            batch.append(update)
+            batch_bytes += size
+        if batch:
+            await self._publish_stock_batch(batch)
+
+    async def _publish_stock_batch(self, updates: List[dict]):
+        await self.publish({
+            "type": "STOCK_BATCH",
+            "updates": updates,
+            "timestamp": str(datetime.now())
+        })
+
+    async def broadcast_order_event(self, order_id: int, order_number: str, total_amount: float, status: str):
+        """Announce a newly placed order to admin dashboards."""
+        payload = {
+            "type": "ORDER_CREATED",
+            "order_id": order_id,
+            "order_number": order_number,
+            "total_amount": total_amount,
+            "status": status,
             "timestamp": str(datetime.now())
         }
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(payload))
-            except:
-                # Handle disconnected clients gracefully
-                pass
+        await self.publish(payload)
+
+    async def _on_event(self, payload: dict):
+        """Bus handler: number the event, keep it for replay and queue it for subscribers."""
+        self.stats.messages_published += 1
+        self.seq += 1
+        payload = {**payload, "seq": self.seq, "epoch": self.epoch}
+        frame = json.dumps(payload)
+        self.history.append((self.seq, payload, frame))
+
+        if payload.get("type") == "STOCK_BATCH":
+            self._fan_out_stock_batch(payload, frame)
+            self.public.on_stock_batch(payload)
+            return
+        recipients = set(self.topics.get(TOPIC_ALL, ()))
+        topic = EVENT_TOPICS.get(payload.get("type"))
+        if topic:
+            recipients.update(self.topics.get(topic, ()))
+        for client in recipients:
+            client.deliver(self.seq, frame)
+
+    def _fan_out_stock_batch(self, payload: dict, frame: str):
+        # Each frame goes with its payload so a backed-up client can merge it per product
+        seq = payload["seq"]
+        firehose = self.topics.get(TOPIC_ALL, set())
+        for client in firehose:
+            client.deliver(seq, frame, payload)
+
+        # Narrow subscribers get only their updates; the work is proportional to
+        # (updates x subscribers of their topics), not to all connections
+        updates = payload["updates"]
+        selected: Dict[ClientConnection, List[int]] = {}
+        for index, update in enumerate(updates):
+            for topic in stock_update_topics(update):
+                for client in self.topics.get(topic, ()):
+                    if client in firehose:
+                        continue
+                    indices = selected.setdefault(client, [])
+                    if not indices or indices[-1] != index:
+                        indices.append(index)
+
+        # Clients watching the same subset share one encoded frame
+        frames: Dict[tuple, Tuple[str, dict]] = {}
+        for client, indices in selected.items():
+            key = tuple(indices)
+            if key not in frames:
+                subset = {**payload, "updates": [updates[i] for i in indices]}
+                frames[key] = (json.dumps(subset), subset)
+            client.deliver(seq, *frames[key])
+
+    def metrics(self) -> dict:
+        depths = [len(client.queue) for client in self.active_connections.values()]
+        return {
+            "connections": len(self.active_connections),
+            "topics": len(self.topics),
+            "subscriptions": sum(len(clients) for clients in self.topics.values()),
+            "queue_depth": {
+                "total": sum(depths),
+                "max": max(depths, default=0),
+                "capacity": WS_QUEUE_SIZE,
+            },
+            "overflow_policy": WS_OVERFLOW_POLICY,
+            "messages_published": self.stats.messages_published,
+            "frames_enqueued": self.stats.frames_enqueued,
+            "frames_sent": self.stats.frames_sent,
+            "frames_dropped": self.stats.frames_dropped,
+            "frames_coalesced": self.stats.frames_coalesced,
+            "failed_sends": self.stats.failed_sends,
+            "slow_disconnects": self.stats.slow_disconnects,
+            "reaped_idle": self.stats.reaped_idle,
+            "send_latency": self.stats.latency_summary(),
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "replay_buffer": {"size": len(self.history), "capacity": WS_REPLAY_BUFFER_SIZE},
+            "resumes_replayed": self.stats.resumes_replayed,
+            "resumes_snapshot": self.stats.resumes_snapshot,
+            "public": self.public.metrics(),
+        }
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
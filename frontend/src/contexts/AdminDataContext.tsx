@@ -200,6 +200,11 @@ interface StockUpdateEvent {
   new_stock: number;
 }
 
+interface StockBatchEvent {
+  type: 'STOCK_BATCH';
+  updates: { product_id: number; new_stock: number }[];
+}
+
 interface AdminDataContextType {
   products: AdminProduct[];
   addProduct: (product: Omit<AdminProduct, 'id'>) => string;
@@ -563,18 +568,71 @@ export const AdminDataProvider: React.FC<{ children: React.ReactNode }> = ({ chi
   useEffect(() => {
     const wsUrl = API_URL.replace('http', 'ws') + '/ws/admin';
     let ws: WebSocket;
+    // Last event seen, so a reconnect only fetches what was missed
+    let lastEpoch: string | null = null;
+    let lastSeq = 0;
+
+    const resume = () => {
+      ws.send(JSON.stringify({ action: 'resume', epoch: lastEpoch, last_seq: lastSeq }));
+    };
 
     const connectWs = () => {
-      ws = new WebSocket(wsUrl);
+      // On reconnect the server queues the missed events (or a snapshot) before any live event
+      ws = new WebSocket(
+        lastEpoch ? `${wsUrl}?epoch=${encodeURIComponent(lastEpoch)}&last_seq=${lastSeq}` : wsUrl
+      );
 
       ws.onopen = () => {
         console.log('🟢 Admin WebSocket Connected');
       };
 
       ws.onmessage = (event) => {
-        const data: StockUpdateEvent = JSON.parse(event.data);
-        
-        if (data.type === 'STOCK_UPDATE') {
+        const data = JSON.parse(event.data);
+
+        if (data.type === 'PING') {
+          // Server heartbeat: silent sockets are reaped
+          ws.send(JSON.stringify({ action: 'pong' }));
+          return;
+        }
+
+        if (typeof data.seq === 'number') {
+          if (data.type === 'HELLO') {
+            if (!lastEpoch) {
+              lastEpoch = data.epoch;
+              lastSeq = data.seq;
+            }
+          } else if (data.type === 'SNAPSHOT') {
+            lastSeq = data.epoch === lastEpoch ? Math.max(lastSeq, data.seq) : data.seq;
+            lastEpoch = data.epoch;
+          } else if (data.epoch === lastEpoch) {
+            // Already applied: an older stock level must not overwrite a newer one
+            if (data.seq <= lastSeq) return;
+            // Frames were dropped while we lagged: ask for the gap (merged batches cover first_seq..seq)
+            if ((data.first_seq ?? data.seq) > lastSeq + 1) resume();
+            lastSeq = data.seq;
+          }
+        }
+
+        if (data.type === 'SNAPSHOT') {
+          const latest = new Map<string, number>(
+            (data.stock as [number, number][]).map(([id, stock]) => [id.toString(), stock])
+          );
+          setProducts(prevProducts =>
+            prevProducts.map(p => (latest.has(p.id) ? { ...p, stock: latest.get(p.id)! } : p))
+          );
+        } else if (data.type === 'STOCK_BATCH') {
+          // One message per batch window: apply all updates in a single state change
+          const batch = data as StockBatchEvent;
+          const latest = new Map(batch.updates.map(u => [u.product_id.toString(), u.new_stock]));
+          setProducts(prevProducts =>
+            prevProducts.map(p => (latest.has(p.id) ? { ...p, stock: latest.get(p.id)! } : p))
+          );
+          toast.info(
+            latest.size === 1
+              ? `Stock Updated: product #${batch.updates[0].product_id} is now ${batch.updates[0].new_stock}`
+              : `Stock Updated: ${latest.size} products`
+          );
+        } else if (data.type === 'STOCK_UPDATE') {
           setProducts(prevProducts => 
             prevProducts.map(p => {
               if (p.id === data.product_id.toString()) {
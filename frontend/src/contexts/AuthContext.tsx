@@ -49,7 +49,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
         headers: { 'Content-Type': 'application/x-www-form-urlencoded' }
       });
 
-      const { access_token, role: serverRole } = response.data;
+      const { access_token, refresh_token, role: serverRole } = response.data;
 
       // Validate role if specific role was requested
       if (role && serverRole !== role) {
@@ -59,6 +59,7 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
       
       // Save session
       localStorage.setItem('access_token', access_token);
+      localStorage.setItem('refresh_token', refresh_token);
       
       // Construct user object (Backend doesn't return name on login yet, using email prefix as fallback)
       const userData: User = { 
@@ -112,7 +113,13 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   }, []);
 
   const logout = useCallback(() => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      // Revoke the server-side session; local state is cleared regardless
+      api.post('/auth/logout', { refresh_token: refreshToken }).catch(() => undefined);
+    }
     localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user_data');
     setUser(null);
     toast.info("Logged out successfully");
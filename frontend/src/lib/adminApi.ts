@@ -149,10 +149,28 @@ export interface PaymentTerm {
   created_at: string;
 }
 
+// ============= PAGINATION =============
+
+// Admin list endpoints return keyset pages; follow X-Next-Cursor to the last one
+const PAGE_SIZE = 500;
+
+async function fetchAllPages<T>(url: string, params: Record<string, unknown> = {}) {
+  const data: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const response = await api.get<T[]>(url, {
+      params: { ...params, limit: PAGE_SIZE, ...(cursor ? { cursor } : {}) },
+    });
+    data.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return { data };
+}
+
 // ============= PRODUCTS API =============
 
 export const productsApi = {
-  getAll: () => api.get<Product[]>('/admin/products'),
+  getAll: () => fetchAllPages<Product>('/admin/products'),
   getById: (id: number) => api.get<Product>(`/admin/products/${id}`),
   create: (data: Partial<Product>) => api.post<Product>('/admin/products', data),
   update: (id: number, data: Partial<Product>) => api.put<Product>(`/admin/products/${id}`, data),
@@ -164,7 +182,7 @@ export const productsApi = {
 export const contactsApi = {
   getAll: (type?: 'customer' | 'vendor') => {
     const params = type ? { contact_type: type } : {};
-    return api.get<Contact[]>('/admin/contacts', { params });
+    return fetchAllPages<Contact>('/admin/contacts', params);
   },
   getById: (id: number) => api.get<Contact>(`/admin/contacts/${id}`),
   create: (data: Partial<Contact>) => api.post<Contact>('/admin/contacts', data),
@@ -175,7 +193,7 @@ export const contactsApi = {
 // ============= SALES ORDERS API =============
 
 export const salesOrdersApi = {
-  getAll: () => api.get<SaleOrder[]>('/admin/sales-orders'),
+  getAll: () => fetchAllPages<SaleOrder>('/admin/sales-orders'),
   getById: (id: number) => api.get<SaleOrder>(`/admin/sales-orders/${id}`),
   create: (data: {
     customer_id: number;
@@ -203,7 +221,7 @@ export const salesOrdersApi = {
 // ============= INVOICES API =============
 
 export const invoicesApi = {
-  getAll: () => api.get<Invoice[]>('/admin/invoices'),
+  getAll: () => fetchAllPages<Invoice>('/admin/invoices'),
   getById: (id: number) => api.get<Invoice>(`/admin/invoices/${id}`),
   create: (data: {
     customer_id: number;
@@ -230,7 +248,7 @@ export const invoicesApi = {
 // ============= PURCHASE ORDERS API =============
 
 export const purchaseOrdersApi = {
-  getAll: () => api.get<PurchaseOrder[]>('/admin/purchase-orders'),
+  getAll: () => fetchAllPages<PurchaseOrder>('/admin/purchase-orders'),
   getById: (id: number) => api.get<PurchaseOrder>(`/admin/purchase-orders/${id}`),
   create: (data: {
     vendor_id: number;
@@ -257,7 +275,7 @@ export const purchaseOrdersApi = {
 // ============= VENDOR BILLS API =============
 
 export const vendorBillsApi = {
-  getAll: () => api.get<VendorBill[]>('/admin/vendor-bills'),
+  getAll: () => fetchAllPages<VendorBill>('/admin/vendor-bills'),
   getById: (id: number) => api.get<VendorBill>(`/admin/vendor-bills/${id}`),
   create: (data: {
     vendor_id: number;
@@ -284,7 +302,7 @@ export const vendorBillsApi = {
 // ============= PAYMENTS API =============
 
 export const paymentsApi = {
-  getAll: () => api.get<Payment[]>('/admin/payments'),
+  getAll: () => fetchAllPages<Payment>('/admin/payments'),
   getById: (id: number) => api.get<Payment>(`/admin/payments/${id}`),
   create: (data: {
     payment_date: string;
@@ -181,10 +181,13 @@ const Dashboard = () => {
     
     try {
       setChangingPassword(true);
-      await api.post('/auth/change-password', {
+      const response = await api.post('/auth/change-password', {
         current_password: passwords.current,
         new_password: passwords.new,
       });
+      // Every old session was revoked; keep this one signed in with the new pair
+      localStorage.setItem('access_token', response.data.access_token);
+      localStorage.setItem('refresh_token', response.data.refresh_token);
       toast.success('Password changed successfully');
       setPasswords({ current: '', new: '', confirm: '' });
     } catch (error: unknown) {